@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Rebuild the local history (hourly averages, daily solar yield) from
+# InfluxDB after the display Pi has been offline or rebooted.  Safe to run
+# as often as you like: it picks up from where the last run stopped, one
+# time slice at a time, so it can be killed at any point and restarted.
+
+import argparse
+import logging
+import os
+import time
+
+from datasource import FetchError, connect, stream_points
+from history import History
+from runlock import single_run
+from settings import (BATTERY_SOC_FIELD, PV_POWER_FIELD, BATTERY_FLOW_FIELD,
+                      HISTORY_FILE, HISTORY_DAYS, BACKFILL_SLICE_HOURS,
+                      BACKFILL_CHUNK_SIZE, BACKFILL_LOCK_FILE,
+                      BACKFILL_SITE_LOCK_FILE, SITES, SITE_DIR)
+
+FIELDS = (BATTERY_SOC_FIELD, PV_POWER_FIELD, BATTERY_FLOW_FIELD)
+
+def slices(start, end, hours):
+    # Walk from start to end in steps of 'hours', on hour boundaries so
+    # that every hourly bucket we write is complete.
+    step = hours * 3600
+    while start < end:
+        stop = min(start - start % step + step, end)
+        yield start, stop
+        start = stop
+
+
+def backfill(client, history, end, slice_hours, chunk_size):
+    start = history.until or end - HISTORY_DAYS * 86400
+    start = max(start, end - HISTORY_DAYS * 86400)
+
+    for slice_start, slice_end in slices(start, end, slice_hours):
+        chunk = history.slice()
+        points = 0
+
+        for field in FIELDS:
+            for t, value in stream_points(client=client, field=field,
+                                          start=slice_start, end=slice_end,
+                                          chunk_size=chunk_size):
+                chunk.add(field, t, value)
+                points += 1
+
+        # Only now does this slice count as done.  Saving after every
+        # slice is what lets an interrupted backfill resume from here.
+        history.merge(chunk, slice_end)
+        history.save()
+
+        logging.info(f'{time.strftime("%m/%d %H:%M", time.localtime(slice_start))}'
+                     f' - {time.strftime("%m/%d %H:%M", time.localtime(slice_end))}'
+                     f': {points} points')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rebuild local history from InfluxDB')
+    parser.add_argument('--slice-hours', type=int,
+                        default=BACKFILL_SLICE_HOURS)
+    parser.add_argument('--chunk-size', type=int,
+                        default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument('--restart', action='store_true',
+                        help='throw away local history and start over')
+    parser.add_argument('--site', choices=list(SITES),
+                        help="a render server site's history rather than "
+                             "this display's own")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.site:
+        client = connect(**SITES[args.site])
+        path = os.path.join(SITE_DIR, args.site, HISTORY_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = BACKFILL_SITE_LOCK_FILE.format(site=args.site)
+    else:
+        client = connect()
+        path = HISTORY_FILE
+        lock_file = BACKFILL_LOCK_FILE
+
+    # A backfill can take a while, so there is no deadline on it, but two
+    # of them must never fold the same slice in twice.  Every site has its
+    # own history, and its own lock, so they do not hold each other up.
+    with single_run(lock_file, 0):
+        if args.restart and os.path.exists(path):
+            os.remove(path)
+
+        history = History(path)
+
+        # Stop at the last whole hour, the current one is still filling up.
+        now = int(time.time())
+        end = now - now % 3600
+
+        try:
+            backfill(client, history, end, args.slice_hours,
+                     args.chunk_size)
+        except FetchError as e:
+            logging.info(f'backfill stopped, will resume from here: {e}')
+
+
+if __name__ == '__main__':
+    main()
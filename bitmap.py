@@ -0,0 +1,170 @@
+# The overview page drawn straight into the panel's frame layout.
+#
+# render.py draws a landscape Pillow image, which then gets rotated for the
+# upside down mounting and transposed into the panel's portrait, column
+# major frame RAM layout.  Here every character of every overview field is
+# a sprite that is already in that layout, built once from the font with
+# Pillow (see build-sprites.py), and a frame is just those sprites ANDed
+# into a copy of a blank frame: no image, no rotation, no repacking.
+#
+# The panel's rows run along the landscape x axis, so a character's
+# position along its line picks whole frame rows, and the line's y picks
+# the same bytes within each row every time.  That makes every blit a run
+# of whole bytes per row.  The output is bit for bit what render.py's
+# overview packs to; 'build-sprites.py --check' verifies that.
+
+import hashlib
+import json
+import os
+
+import render
+from render import (WIDTH, HEIGHT, FONT_FILE, OVERVIEW_FIELDS, OVERVIEW_RULES,
+                    field_x)
+
+SPRITE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'sprites.json')
+
+# Everything the overview fields can contain.
+CHARS = '0123456789-%W h\u2192\u221eHoursmold'
+
+# Frame layout: the panel's native portrait is HEIGHT pixels wide, and each
+# landscape column is one row of it.
+STRIDE = HEIGHT // 8
+
+# Room either side of a character for ink beyond its advance.
+PAD = 16
+
+
+def landscape_to_native(image):
+    # The same turn update-display.py's pack() and the panel driver give a
+    # landscape image: 180 degrees for the mounting, then 90 back into the
+    # panel's portrait.  Used at build time only.
+    from PIL import Image
+
+    return image.rotate(180).transpose(Image.ROTATE_90)
+
+
+def build_sprites():
+    from PIL import Image, ImageDraw
+    from render import advance, font
+
+    sprites = {}
+    for size, y, align, text in OVERVIEW_FIELDS:
+        line = sprites.setdefault(f'{size}/{y}', {})
+        for char in CHARS:
+            f = font(size)
+            width = advance(f, char)
+
+            # Draw the character exactly as render.field() would, into a
+            # strip as tall as the page, and turn that into frame rows.
+            strip = Image.new('1', (width + 2 * PAD, HEIGHT), 255)
+            ImageDraw.Draw(strip).text((PAD, y), char, font=f, fill='black')
+            rows = landscape_to_native(strip).tobytes()
+
+            ink = [r for r in range(strip.width)
+                   if rows[r * STRIDE:(r + 1) * STRIDE] != b'\xff' * STRIDE]
+            if not ink:
+                line[char] = [width, 0, 0, 0, '']
+                continue
+
+            # Only keep the bytes of each row that have ink in them.
+            cols = [c for c in range(STRIDE)
+                    if any(rows[r * STRIDE + c] != 0xFF for r in ink)]
+            first, last = cols[0], cols[-1] + 1
+            data = b''.join(rows[r * STRIDE + first:r * STRIDE + last]
+                            for r in range(ink[0], ink[-1] + 1))
+
+            line[char] = [width, ink[0] - PAD, first, last - first,
+                          data.hex()]
+
+    return sprites
+
+
+def fingerprint():
+    # Everything the sprites are made from: the font, render.py (the
+    # overview layout and how it places characters), the characters and
+    # padding here, and the Pillow that rasterized them.
+    import PIL
+
+    digest = hashlib.sha256()
+    for path in (FONT_FILE, render.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(f'{CHARS}/{PAD}/{PIL.__version__}'.encode())
+    return digest.hexdigest()
+
+
+def save_sprites(sprites, path=SPRITE_FILE):
+    # Replaced atomically; the cron job and --keys may both get here.
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'fingerprint': fingerprint(), 'lines': sprites}, f)
+    os.replace(tmp, path)
+
+
+def load_sprites(path=SPRITE_FILE):
+    # None if there are no sprites, or if they were built from anything
+    # other than what is here now.
+    try:
+        with open(path) as f:
+            sprites = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if sprites.get('fingerprint') != fingerprint():
+        return None
+    return sprites['lines']
+
+
+class BitmapRenderer:
+    def __init__(self, path=SPRITE_FILE):
+        sprites = load_sprites(path)
+        if sprites is None:
+            sprites = build_sprites()
+            save_sprites(sprites, path)
+
+        # char -> (advance, first row, first byte, bytes per row, data)
+        self.lines = {}
+        for line, chars in sprites.items():
+            self.lines[line] = {
+                char: (width, dx, col, span, bytes.fromhex(data))
+                for char, (width, dx, col, span, data) in chars.items()}
+
+        self.blank = self.build_blank()
+
+    def build_blank(self):
+        # A white frame with the overview's rules already on it.
+        frame = bytearray(b'\xff' * (STRIDE * WIDTH))
+        for y in OVERVIEW_RULES:
+            for line_y in (y, y + 1):
+                col = HEIGHT - 1 - line_y
+                for row in range(10, 255):
+                    frame[row * STRIDE + col // 8] &= ~(0x80 >> col % 8)
+        return frame
+
+    def render_overview(self, readings):
+        frame = bytearray(self.blank)
+
+        for size, y, align, text in OVERVIEW_FIELDS:
+            sprites = self.lines[f'{size}/{y}']
+            text = text(readings)
+            x = field_x(align, sum(sprites[char][0] for char in text))
+
+            for char in text:
+                width, dx, col, span, data = sprites[char]
+                if data:
+                    self.blit(frame, x + dx, col, span, data)
+                x += width
+
+        return bytes(frame)
+
+    @staticmethod
+    def blit(frame, row, col, span, data):
+        # AND each row of the sprite into the frame; 0 bits are ink.
+        for i in range(0, len(data), span):
+            if 0 <= row < WIDTH:
+                start = row * STRIDE + col
+                ink = int.from_bytes(data[i:i + span], 'big')
+                here = int.from_bytes(frame[start:start + span], 'big')
+                frame[start:start + span] = (here & ink).to_bytes(span, 'big')
+            row += 1
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Build sprites.json, the pre-packed characters bitmap.py draws the overview
+# page with, from the same font render.py uses.  bitmap.py also rebuilds
+# them by itself when the font or the overview layout have changed since.
+# With --check, also render a spread of readings both ways and make sure
+# the frames come out identical.
+
+import argparse
+import datetime
+import itertools
+import sys
+
+from bitmap import BitmapRenderer, build_sprites, save_sprites
+from readings import derive
+from render import render_overview
+from waveshare_epd.models import EPD2IN7
+from waveshare_epd.panelmodel import pack
+
+
+def sample_readings():
+    now = datetime.datetime(2021, 6, 1, 12, 0)
+    for soc, pv, flow, pv_yield, stale in itertools.product(
+            (5, 42, 100), (0, 7, 165), (-480, -3, 0, 96), (0, 1234),
+            (None, 7)):
+        yield derive({'time': now, 'stale_minutes': stale,
+                      'battery_soc': soc, 'pv_power': pv,
+                      'battery_flow': flow, 'pv_yield': pv_yield,
+                      'pv_power_15m': pv, 'battery_flow_15m': flow})
+
+
+def check():
+    bitmap = BitmapRenderer()
+    failures = 0
+    for readings in sample_readings():
+        # What update-display.py's pack() makes of the Pillow page
+        expected = pack(EPD2IN7, render_overview(readings).rotate(180))
+        if bitmap.render_overview(readings) != expected:
+            failures += 1
+            print(f'mismatch: {readings}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build the sprites for the bitmap renderer')
+    parser.add_argument('--check', action='store_true',
+                        help='compare against the Pillow renderer')
+    args = parser.parse_args()
+
+    save_sprites(build_sprites())
+
+    if args.check and check():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Make sure the model-driven driver (waveshare_epd/panel.py and models.py)
+# sends the panel exactly what Waveshare's own epd2in7.py does.  Both are
+# run against the emulator backend, with every byte that goes out over
+# SPI recorded along with the state of the DC pin, for mono and 4-gray
+# frames in both orientations.  Run it again after touching models.py.
+
+import os
+import random
+import sys
+
+os.environ['EPD_BACKEND'] = 'emulator'
+
+from PIL import Image
+
+from waveshare_epd import epd2in7, epdconfig
+from waveshare_epd.models import EPD2IN7
+from waveshare_epd.panel import Panel
+
+LEVELS = (0x00, 0x33, 0x80, 0xC0, 0xFF)
+
+
+def record():
+    # Wrap epdconfig's pin and SPI functions so that everything still goes
+    # to the emulator, and every byte is logged as (DC, byte).
+    sent = []
+    dc = [0]
+    digital_write = epdconfig.digital_write
+    spi_writebyte = epdconfig.spi_writebyte
+    spi_writebyte2 = epdconfig.spi_writebyte2
+
+    def write_pin(pin, value):
+        if pin == epdconfig.DC_PIN:
+            dc[0] = value
+        digital_write(pin, value)
+
+    def write(data):
+        sent.extend((dc[0], byte) for byte in data)
+        spi_writebyte(data)
+
+    def write_bulk(data):
+        sent.extend((dc[0], byte) for byte in data)
+        spi_writebyte2(data)
+
+    epdconfig.digital_write = write_pin
+    epdconfig.spi_writebyte = write
+    epdconfig.spi_writebyte2 = write_bulk
+    return sent
+
+
+def test_image(size):
+    image = Image.new('L', size)
+    image.putdata([random.choice(LEVELS) for i in range(size[0] * size[1])])
+    return image
+
+
+def vendor(image, gray):
+    epd = epd2in7.EPD()
+    if gray:
+        epd.Init_4Gray()
+        epd.display_4Gray(epd.getbuffer_4Gray(image))
+    else:
+        epd.init()
+        epd.display(epd.getbuffer(image))
+        epd.sleep()
+
+
+def ours(image, gray):
+    epd = Panel(EPD2IN7)
+    if gray:
+        epd.init(gray=True)
+        epd.display_4gray(epd.getbuffer_4gray(image))
+    else:
+        epd.init()
+        epd.display(epd.getbuffer(image))
+        epd.sleep()
+
+
+def main():
+    random.seed(1)
+    sent = record()
+    failures = 0
+
+    for size in ((EPD2IN7.height, EPD2IN7.width),
+                 (EPD2IN7.width, EPD2IN7.height)):
+        image = test_image(size)
+        for gray in (False, True):
+            sent.clear()
+            vendor(image, gray)
+            expected = list(sent)
+
+            sent.clear()
+            ours(image, gray)
+
+            mode = '4-gray' if gray else 'mono'
+            same = sent == expected
+            print(f'{size[0]}x{size[1]} {mode}: '
+                  f'{len(sent)} bytes, {"same" if same else "DIFFERENT"}')
+            failures += not same
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
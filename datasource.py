@@ -0,0 +1,180 @@
+import datetime
+import json
+import logging
+import os
+import random
+import time
+
+import pytz
+import requests
+from influxdb import InfluxDBClient
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+
+from settings import (INFLUX_HOSTNAME, INFLUX_PORT, INFLUX_DATABASE,
+                      INFLUX_TIMEOUT, INFLUX_RETRIES, INFLUX_BACKOFF,
+                      PV_POWER_FIELD, TIMEZONE)
+
+# Anything in here means we could not talk to InfluxDB, as opposed to
+# InfluxDB telling us there is simply no data.
+FETCH_ERRORS = (requests.exceptions.RequestException,
+                InfluxDBClientError, InfluxDBServerError)
+
+
+class FetchError(Exception):
+    pass
+
+
+def connect(hostname=INFLUX_HOSTNAME, port=INFLUX_PORT,
+            database=INFLUX_DATABASE):
+    # One client per run, which holds a single keep-alive connection that
+    # every query reuses.  We do our own retrying in query() so that we can
+    # back off between attempts; the client only retries POSTs that way.
+    # The render server keeps one of these per site.
+    return InfluxDBClient(hostname, port,
+                          database=database,
+                          timeout=INFLUX_TIMEOUT,
+                          retries=1,
+                          pool_size=1)
+
+
+def query(client, query, **kwargs):
+    for attempt in range(INFLUX_RETRIES):
+        try:
+            # against the database the client was connected with
+            return client.query(query, **kwargs)
+
+        except FETCH_ERRORS as e:
+            logging.info(f'query failed (attempt {attempt + 1}): {e}')
+            if attempt + 1 == INFLUX_RETRIES:
+                raise FetchError(e) from e
+
+            # exponential backoff with a bit of jitter
+            time.sleep(INFLUX_BACKOFF * (2 ** attempt) * random.uniform(1, 2))
+
+
+def get_average(client=None, field=None, duration='3m'):
+    try:
+        result = query(client, f'SELECT mean("value") FROM "{field}" '
+                               f'WHERE time >= now() - {duration}')
+
+        # pull out the field we want
+        result = result[(field, None)]
+
+        # convert to a list, grab the first element, which is a dictionary
+        result = list(result)[0]
+
+        # get the value of 'mean', which is what we asked for
+        result = result.get('mean', 0)
+
+        # we do not need sub-integer precision
+        return round(result)
+
+    except IndexError:
+        return 0
+
+
+def get_yield(client=None, field=PV_POWER_FIELD):
+    now = datetime.datetime.now(tz=pytz.timezone(TIMEZONE))
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes_since_midnight = (now - midnight).seconds // 60
+
+    try:
+        result = query(client, f'SELECT INTEGRAL("value", 60m) FROM "{field}" '
+                               f'WHERE time >= now() - {minutes_since_midnight}m')
+
+        # pull out the field we want
+        result = result[(field, None)]
+
+        # convert to a list, grab the first element, which is a dictionary
+        result = list(result)[0]
+
+        # get the value of 'integral', which is what we asked for
+        result = result.get('integral', 0)
+
+        # we do not need sub-integer precision
+        return round(result)
+
+    except IndexError:
+        return 0
+
+
+class ValueCache:
+    """Last-known-good readings, with the time each one was fetched.
+
+    Values are only written back when they came fresh out of InfluxDB, so
+    the timestamps tell us how old the display really is.
+
+    Once a query has run out of retries, the rest of the round comes
+    straight out of the cache: on a link that hangs, every query would
+    otherwise sit through all of its timeouts, and together they take
+    longer than a run is allowed to."""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        self.stale = {}
+        self.unreachable = False
+
+        try:
+            with open(path) as f:
+                self.values = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def fetch(self, name, func, *args, missing=None, **kwargs):
+        # Run one of the get_*() functions above.  If InfluxDB cannot be
+        # reached, or the value comes back as 'missing', fall back to the
+        # cached value and remember how old it is.
+        value = missing
+        if not self.unreachable:
+            try:
+                value = func(*args, **kwargs)
+            except FetchError:
+                self.unreachable = True
+
+        if value != missing:
+            self.values[name] = {'value': value, 'time': time.time()}
+            self.stale.pop(name, None)
+            return value
+
+        if name not in self.values:
+            return missing
+
+        cached = self.values[name]
+        self.stale[name] = time.time() - cached['time']
+        return cached['value']
+
+    def retry(self):
+        # Start a new round of fetches, trying InfluxDB again.
+        self.unreachable = False
+
+    def staleness(self):
+        # Age in whole minutes of the oldest value we had to fall back on,
+        # or None if everything is fresh.
+        if not self.stale:
+            return None
+        return int(max(self.stale.values()) // 60)
+
+    def save(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.values, f)
+        os.replace(tmp, self.path)
+
+
+def stream_points(client=None, field=None, start=None, end=None,
+                  chunk_size=0):
+    # Yield (epoch seconds, value) for every raw sample of 'field' between
+    # 'start' and 'end'.  With chunked responses InfluxDB sends the result
+    # back a chunk at a time and we only ever hold one chunk in memory.
+    chunks = query(client, f'SELECT "value" FROM "{field}" '
+                           f'WHERE time >= {start}s AND time < {end}s',
+                   epoch='s', chunked=True, chunk_size=chunk_size)
+
+    try:
+        for chunk in chunks:
+            for point in chunk.get_points():
+                yield point['time'], point['value']
+
+    except FETCH_ERRORS as e:
+        raise FetchError(e) from e
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# The display side of the render server (update-display.py --serve): ask
+# the server for this site's frame every so often, and put whatever comes
+# back on the panel.  No InfluxDB and no rendering happen here, it is just
+# an HTTP GET and the SPI transfer.
+
+import argparse
+import logging
+import time
+
+from frameserver import FrameClient, FrameError
+from output import open_output
+from runlock import single_run
+from settings import LOCK_FILE, SERVER_URL, SITE, CLIENT_POLL
+from waveshare_epd.models import EPD2IN7
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show a render server's frames on the e-Paper display")
+    parser.add_argument('--server', default=SERVER_URL)
+    parser.add_argument('--site', default=SITE)
+    parser.add_argument('--page', default='overview')
+    parser.add_argument('--interval', type=float, default=CLIENT_POLL,
+                        help='seconds between polls')
+    args = parser.parse_args()
+
+    client = FrameClient(args.server, args.site, args.page,
+                         frame_size=EPD2IN7.frame_size)
+    output = open_output()
+
+    try:
+        while True:
+            try:
+                frame = client.fetch()
+                if frame is not None:
+                    # Nothing else to show for a while, power down
+                    output.show(frame)
+                    output.rest()
+            except FrameError as e:
+                # Keep showing the last frame until the server is back
+                logging.info(e)
+
+            time.sleep(args.interval)
+
+    except KeyboardInterrupt:
+        logging.info("ctrl + c:")
+
+    finally:
+        client.close()
+        output.close()
+
+
+if __name__ == '__main__':
+    # Same lock as update-display.py, so the two never fight over the panel
+    with single_run(LOCK_FILE, 0):
+        main()
@@ -0,0 +1,149 @@
+import contextlib
+import fcntl
+import os
+import struct
+import sys
+from multiprocessing import shared_memory
+
+# Header: sequence number of the newest frame, which slot holds it, which
+# slot the writer is reading, and the pid of the panel writer.
+HEADER = struct.Struct('<QBBxxxxxQ')
+HEADER_SIZE = 32
+NO_SLOT = 0xFF
+
+
+def _open(name, create=False, size=0):
+    # Before Python 3.13 every process that opens the block registers it
+    # with its resource tracker, which then unlinks it when that process
+    # exits, out from under everyone else.  The writer unlinks it itself.
+    try:
+        return shared_memory.SharedMemory(name, create, size, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name, create, size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FrameBuffer:
+    """Packed panel frames, double buffered in shared memory.
+
+    One process publishes frames, one (the panel writer) displays them.
+    The publisher always fills a slot the writer is not reading, and the
+    writer hands its slot straight to SPI without copying it.  Frames that
+    arrive while the panel is busy overwrite each other, so the writer
+    only ever picks up the newest.
+
+    The header is only ever touched under a file lock, and only for a few
+    microseconds; nobody holds it while copying or displaying a frame."""
+
+    def __init__(self, name, shm, frame_size):
+        self.shm = shm
+        self.frame_size = frame_size
+        self.buf = shm.buf
+        self.lock = open(f'/tmp/{name}.lock', 'a')
+
+    @classmethod
+    def create(cls, name, frame_size):
+        size = HEADER_SIZE + 2 * frame_size
+        try:
+            shm = _open(name)
+            if shm.size < size:
+                raise ValueError(f'{name} is too small for {frame_size} '
+                                 f'byte frames')
+        except FileNotFoundError:
+            shm = _open(name, create=True, size=size)
+            HEADER.pack_into(shm.buf, 0, 0, NO_SLOT, NO_SLOT, 0)
+
+        fb = cls(name, shm, frame_size)
+        with fb.locked() as (seq, latest, reading, writer):
+            fb.set_header(seq, latest, NO_SLOT, os.getpid())
+        return fb
+
+    @classmethod
+    def attach(cls, name, frame_size):
+        # None unless there is a panel writer alive to display our frames.
+        try:
+            fb = cls(name, _open(name), frame_size)
+        except FileNotFoundError:
+            return None
+
+        if not fb.writer_alive():
+            fb.close()
+            return None
+        return fb
+
+    @contextlib.contextmanager
+    def locked(self):
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            yield HEADER.unpack_from(self.buf, 0)
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def set_header(self, seq, latest, reading, writer):
+        HEADER.pack_into(self.buf, 0, seq, latest, reading, writer)
+
+    def writer_alive(self):
+        pid = HEADER.unpack_from(self.buf, 0)[3]
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def slot(self, index):
+        start = HEADER_SIZE + index * self.frame_size
+        return self.buf[start:start + self.frame_size]
+
+    # Renderer side
+
+    def publish(self, frame):
+        with self.locked() as (seq, latest, reading, writer):
+            if latest == NO_SLOT:
+                target = 0 if reading == 1 else 1
+            elif reading in (NO_SLOT, latest):
+                target = 1 - latest
+            else:
+                # The writer is busy with the other slot, so the newest
+                # frame it has not picked up yet gets replaced.  Take it
+                # away from the writer while we overwrite it.
+                target = latest
+                self.set_header(seq, NO_SLOT, reading, writer)
+
+        self.slot(target)[:] = frame
+
+        with self.locked() as (seq, latest, reading, writer):
+            self.set_header(seq + 1, target, reading, writer)
+
+    # Writer side
+
+    def claim(self, seen):
+        # The newest frame, if it is newer than sequence number 'seen', and
+        # its sequence number.  The slot is ours until release().
+        with self.locked() as (seq, latest, reading, writer):
+            if seq == seen or latest == NO_SLOT:
+                return None, seen
+            self.set_header(seq, latest, latest, writer)
+        return self.slot(latest), seq
+
+    def release(self):
+        with self.locked() as (seq, latest, reading, writer):
+            self.set_header(seq, latest, NO_SLOT, writer)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.lock.close()
+
+    def unlink(self):
+        # Before 3.13 unlink() unregisters from the resource tracker again,
+        # which complains about a block it was told to forget in _open().
+        if sys.version_info < (3, 13):
+            from multiprocessing import resource_tracker
+            resource_tracker.register(self.shm._name, 'shared_memory')
+        self.shm.unlink()
@@ -0,0 +1,136 @@
+# Packed frames over HTTP, between the render server and its displays.
+#
+# The render server (update-display.py --serve) keeps the newest packed
+# frame of every page of every site, compressed once when it is rendered,
+# and serves them as /<site>/<page>.  Each frame's ETag comes from its
+# contents, so a display that already shows it gets an empty 304 back:
+# that is what nearly every poll turns into, since the frames only change
+# every few minutes and often not even then.
+
+import hashlib
+import http.client
+import logging
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+CLIENT_TIMEOUT = 10
+
+
+class FrameError(Exception):
+    pass
+
+
+def frame_etag(frame):
+    return '"' + hashlib.sha1(frame).hexdigest()[:16] + '"'
+
+
+class FrameStore:
+    """The newest frames of every site, ready to go out as they are."""
+
+    def __init__(self):
+        self.sites = {}
+
+    def publish(self, site, frames):
+        # frames maps page names to packed frames.  A site's pages are
+        # swapped in all at once, so a reader never sees half an update.
+        self.sites[site] = {
+            page: (frame_etag(frame), zlib.compress(frame, 9))
+            for page, frame in frames.items()}
+
+    def get(self, site, page):
+        return self.sites.get(site, {}).get(page)
+
+
+class FrameHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so that a display keeps polling over one connection.
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body go out in separate writes; without this, Nagle and
+    # delayed ACKs hold the body back for tens of milliseconds.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        frame = self.server.store.get(*parts) if len(parts) == 2 else None
+        if frame is None:
+            self.send_error(404)
+            return
+
+        etag, body = frame
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Encoding', 'deflate')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f'{self.address_string()} {format % args}')
+
+
+class FrameServer(ThreadingHTTPServer):
+    # Every display holds a connection open, and they tend to all come
+    # back at once after a network blip.
+    request_queue_size = 128
+
+    def __init__(self, address, store):
+        super().__init__(address, FrameHandler)
+        self.store = store
+
+
+class FrameClient:
+    """One display's view of one page on the render server.
+
+    Asks over a kept-alive connection, and only gets the frame back when
+    it differs from the last one this client got."""
+
+    def __init__(self, url, site, page, frame_size=None,
+                 timeout=CLIENT_TIMEOUT):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname,
+                                               parts.port or 80,
+                                               timeout=timeout)
+        self.path = f'/{site}/{page}'
+        self.frame_size = frame_size
+        self.etag = None
+
+    def fetch(self):
+        # The new frame, or None if it has not changed.
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        try:
+            self.conn.request('GET', self.path, headers=headers)
+            response = self.conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # The next request opens a fresh connection
+            self.conn.close()
+            raise FrameError(f'{self.path}: {e}') from e
+
+        if response.status == 304:
+            return None
+        if response.status != 200:
+            raise FrameError(f'{self.path}: {response.status} '
+                             f'{response.reason}')
+
+        try:
+            frame = zlib.decompress(body)
+        except zlib.error as e:
+            raise FrameError(f'{self.path}: {e}') from e
+        if self.frame_size is not None and len(frame) != self.frame_size:
+            raise FrameError(f'{self.path}: {len(frame)} byte frame, '
+                             f'expected {self.frame_size}')
+
+        self.etag = response.getheader('ETag')
+        return frame
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,134 @@
+import datetime
+import json
+import os
+
+import pytz
+
+from settings import PV_POWER_FIELD, TIMEZONE, HISTORY_DAYS
+
+# Samples further apart than this are a hole in the data (the Venus box or
+# the poller was down), not something we should integrate across.
+MAX_SAMPLE_GAP = 15 * 60
+
+
+class Slice:
+    """Aggregates for one time slice of a backfill.
+
+    Points are folded into hourly sums and daily solar yield as they stream
+    past, and only merged into the History once the whole slice has been
+    read, so a slice that gets interrupted half way can simply be redone."""
+
+    def __init__(self, pv_last):
+        self.hourly = {}
+        self.pv_yield = {}
+        self.pv_last = pv_last
+        self.tz = pytz.timezone(TIMEZONE)
+
+    def add(self, field, t, value):
+        if value is None:
+            return
+
+        hour = str(t - t % 3600)
+        total = self.hourly.setdefault(field, {}).setdefault(hour, [0.0, 0])
+        total[0] += value
+        total[1] += 1
+
+        if field == PV_POWER_FIELD:
+            self.add_yield(t, max(value, 0))
+
+    def add_yield(self, t, power):
+        # Trapezoidal integration of solar power into watt hours, booked
+        # against the local date of the later sample.
+        if self.pv_last is not None:
+            last_t, last_power = self.pv_last
+            if 0 < t - last_t <= MAX_SAMPLE_GAP:
+                day = datetime.datetime.fromtimestamp(t, self.tz)
+                day = day.date().isoformat()
+                wh = (power + last_power) / 2 * (t - last_t) / 3600
+                self.pv_yield[day] = self.pv_yield.get(day, 0.0) + wh
+
+        self.pv_last = (t, power)
+
+
+class History:
+    """Hourly averages and daily solar yield kept on the display Pi.
+
+    'until' is the resume marker: everything before it has been folded in,
+    and the next backfill picks up from there."""
+
+    def __init__(self, path):
+        self.path = path
+        self.hourly = {}
+        self.pv_yield = {}
+        self.pv_last = None
+        self.until = None
+
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self.hourly = state.get('hourly', {})
+        self.pv_yield = state.get('yield', {})
+        self.pv_last = state.get('pv_last')
+        self.until = state.get('until')
+
+    def slice(self):
+        return Slice(self.pv_last)
+
+    def merge(self, chunk, until):
+        for field, hours in chunk.hourly.items():
+            ours = self.hourly.setdefault(field, {})
+            for hour, (total, count) in hours.items():
+                mine = ours.setdefault(hour, [0.0, 0])
+                mine[0] += total
+                mine[1] += count
+
+        for day, wh in chunk.pv_yield.items():
+            self.pv_yield[day] = self.pv_yield.get(day, 0.0) + wh
+
+        self.pv_last = chunk.pv_last
+        self.until = until
+        self.prune(until)
+
+    def prune(self, now):
+        oldest = now - HISTORY_DAYS * 86400
+        for hours in self.hourly.values():
+            for hour in [h for h in hours if int(h) < oldest]:
+                del hours[hour]
+
+        # Days are booked in TIMEZONE (see Slice.add_yield()), whatever
+        # timezone this machine is in.
+        tz = pytz.timezone(TIMEZONE)
+        cutoff = datetime.datetime.fromtimestamp(oldest, tz).date()
+        cutoff = cutoff.isoformat()
+        for day in [d for d in self.pv_yield if d < cutoff]:
+            del self.pv_yield[day]
+
+    def mean(self, field, hour):
+        total, count = self.hourly.get(field, {}).get(str(hour), (0, 0))
+        if not count:
+            return None
+        return total / count
+
+    def hourly_means(self, field, end, hours=24):
+        # Means for the 'hours' whole hours leading up to 'end', oldest
+        # first, with None where we have no data.
+        last = end - end % 3600 - 3600
+        return [self.mean(field, last - i * 3600)
+                for i in reversed(range(hours))]
+
+    def daily_yield(self, day):
+        return round(self.pv_yield.get(day.isoformat(), 0))
+
+    def save(self):
+        state = {'hourly': self.hourly,
+                 'yield': self.pv_yield,
+                 'pv_last': self.pv_last,
+                 'until': self.until}
+
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
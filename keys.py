@@ -0,0 +1,22 @@
+import logging
+
+from settings import KEY_PINS, KEY_BOUNCE_MS
+
+
+def watch_keys(callback):
+    # Call callback(index) from RPi.GPIO's event thread whenever one of the
+    # HAT's keys is pressed.  Returns False if there are no keys to watch.
+    try:
+        import RPi.GPIO as GPIO
+    except (ImportError, RuntimeError) as e:
+        logging.info(f'no keys: {e}')
+        return False
+
+    GPIO.setmode(GPIO.BCM)
+    for index, pin in enumerate(KEY_PINS):
+        # the keys pull the pin to ground
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.add_event_detect(pin, GPIO.FALLING,
+                              callback=lambda channel, i=index: callback(i),
+                              bouncetime=KEY_BOUNCE_MS)
+    return True
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# Load test for the render server.  Starts a FrameServer on localhost with
+# a number of made-up sites whose overview frames get re-rendered every
+# --update seconds, then lets many simulated displays poll it for a while
+# and reports requests and frames per second and request latency.
+#
+# The clients poll back to back unless given an --interval, which is far
+# harder on the server than real displays polling every CLIENT_POLL
+# seconds.  Clients and server share one interpreter here; to measure a
+# real update-display.py --serve, point --url at it and name its --site.
+
+import argparse
+import datetime
+import random
+import statistics
+import threading
+import time
+
+from bitmap import BitmapRenderer
+from frameserver import FrameClient, FrameError, FrameServer, FrameStore
+from readings import derive
+from waveshare_epd.models import EPD2IN7
+
+
+def random_readings():
+    pv = random.randint(0, 165)
+    flow = random.randint(-400, 150)
+    return derive({'time': datetime.datetime.now(),
+                   'stale_minutes': random.choice((None, None, None, 9)),
+                   'battery_soc': random.randint(5, 100),
+                   'pv_power': pv,
+                   'battery_flow': flow,
+                   'pv_yield': random.randint(0, 1200),
+                   'pv_power_15m': pv,
+                   'battery_flow_15m': flow})
+
+
+def publish(store, sites, update, stop):
+    # Stands in for update_site(): new readings for every site, every
+    # 'update' seconds.
+    bitmap = BitmapRenderer()
+    while True:
+        for site in sites:
+            frame = bitmap.render_overview(random_readings())
+            store.publish(site, {'overview': frame})
+        if stop.wait(update):
+            return
+
+
+def poll(url, site, interval, deadline, results):
+    # One simulated display.  results gets (latency, got a frame) for
+    # every request, and None for every failed one.
+    client = FrameClient(url, site, 'overview',
+                         frame_size=EPD2IN7.frame_size)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            frame = client.fetch()
+            results.append((time.perf_counter() - start, frame is not None))
+        except FrameError:
+            results.append(None)
+        if interval:
+            time.sleep(interval)
+    client.close()
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test the render server with simulated displays')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to run for (default: 10)')
+    parser.add_argument('--sites', type=int, default=4,
+                        help='made-up sites to serve (default: 4)')
+    parser.add_argument('--update', type=float, default=1,
+                        help='seconds between new frames for each site')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='seconds each client waits between polls')
+    parser.add_argument('--url', help='test this server instead of a '
+                                      'local one')
+    parser.add_argument('--site', action='append',
+                        help='site to ask --url for (repeatable)')
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    server = None
+    if args.url:
+        url, sites = args.url, args.site or ['home']
+    else:
+        store = FrameStore()
+        sites = [f'site{i}' for i in range(args.sites)]
+        publisher = threading.Thread(target=publish,
+                                     args=(store, sites, args.update, stop),
+                                     daemon=True)
+        publisher.start()
+
+        server = FrameServer(('127.0.0.1', 0), store)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        # Let every site get its first frame before the clients start
+        while len(store.sites) < len(sites):
+            time.sleep(0.01)
+
+    # One list per client, so that the clients never contend for a lock
+    deadline = time.monotonic() + args.duration
+    results = [[] for i in range(args.clients)]
+    clients = [threading.Thread(target=poll,
+                                args=(url, sites[i % len(sites)],
+                                      args.interval, deadline, results[i]))
+               for i in range(args.clients)]
+    started = time.monotonic()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - started
+
+    stop.set()
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    ok = [r for client in results for r in client if r is not None]
+    errors = sum(r is None for client in results for r in client)
+    frames = sum(got_frame for latency, got_frame in ok)
+    latencies = sorted(latency * 1000 for latency, got_frame in ok)
+
+    print(f'{args.clients} clients, {len(sites)} sites, {elapsed:.1f} s')
+    print(f'requests:     {len(ok)} ({len(ok) / elapsed:.1f}/s), '
+          f'{errors} errors')
+    print(f'frames:       {frames} ({frames / elapsed:.1f}/s), '
+          f'{len(ok) - frames} not modified')
+    if latencies:
+        print(f'latency (ms): mean {statistics.mean(latencies):.2f}  '
+              f'p50 {percentile(latencies, 50):.2f}  '
+              f'p90 {percentile(latencies, 90):.2f}  '
+              f'p99 {percentile(latencies, 99):.2f}  '
+              f'max {latencies[-1]:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import math
+import os
+from array import array
+
+from settings import PROFILE_ALPHA
+
+HOURS = 7 * 24
+
+# Beyond this many hours we just show infinity.
+MAX_RUNTIME = 999
+
+
+class LoadProfile:
+    """Average power draw for every hour of the week.
+
+    A sample updates one bucket in place, and an estimate walks forward
+    through at most a week of buckets, so neither ever looks at history.
+    Stored as 168 doubles followed by 168 32-bit sample counts."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.draw = array('d', [0.0] * HOURS)
+        self.samples = array('I', [0] * HOURS)
+
+        if path is None:
+            return
+
+        try:
+            with open(path, 'rb') as f:
+                draw = array('d')
+                draw.fromfile(f, HOURS)
+                counts = f.read()
+        except (OSError, EOFError):
+            return
+
+        # Counts used to be stored as array('L'), which is 8 bytes each
+        # on a 64-bit system.
+        if len(counts) == 8 * HOURS:
+            samples = array('I', array('Q', counts))
+        elif len(counts) == 4 * HOURS:
+            samples = array('I', counts)
+        else:
+            return
+
+        self.draw = draw
+        self.samples = samples
+
+    @staticmethod
+    def bucket(when):
+        return when.weekday() * 24 + when.hour
+
+    def update(self, when, watts):
+        b = self.bucket(when)
+        if self.samples[b]:
+            self.draw[b] += PROFILE_ALPHA * (watts - self.draw[b])
+        else:
+            self.draw[b] = watts
+        self.samples[b] += 1
+
+    def runtime(self, when, energy):
+        # Hours until 'energy' watt hours are used up if the load follows
+        # the profile from 'when' on, or None if the profile is empty.
+        if energy <= 0:
+            return 0
+
+        known = [self.draw[b] for b in range(HOURS) if self.samples[b]]
+        if not known:
+            return None
+
+        # Hours we have never seen are assumed to be average ones.
+        typical = sum(known) / len(known)
+        draw = [max(self.draw[b] if self.samples[b] else typical, 0)
+                for b in range(HOURS)]
+
+        week = sum(draw)
+        if week <= 0:
+            return MAX_RUNTIME + 1
+
+        # Skip whole weeks at once; what is left runs out within a week.
+        # Always leave some energy over, or a week that used it up exactly
+        # would end on whatever zero draw hours follow its last load, and
+        # those would then divide by zero below.
+        b = self.bucket(when)
+        hours = 1 - when.minute / 60
+        weeks = max(math.ceil((energy - draw[b] * hours) / week) - 1, 0)
+        energy -= weeks * week
+        elapsed = weeks * HOURS
+
+        while True:
+            used = draw[b] * hours
+            if used >= energy:
+                return elapsed + energy / draw[b]
+            energy -= used
+            elapsed += hours
+            b = (b + 1) % HOURS
+            hours = 1
+
+    def save(self):
+        # Runs under the run deadline, and a file cut short by it would
+        # throw the whole profile away, so replace it atomically.
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'wb') as f:
+            self.draw.tofile(f)
+            self.samples.tofile(f)
+        os.replace(tmp, self.path)
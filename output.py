@@ -0,0 +1,111 @@
+# Where packed frames go: straight to the panel, or to panel-writer.py if
+# that is running.  Used by update-display.py and display-client.py.
+
+import fcntl
+import logging
+import time
+
+from framebuffer import FrameBuffer
+from settings import FRAME_SHM_NAME, PANEL_LOCK_FILE
+from waveshare_epd.models import EPD2IN7
+
+# How often open_output() looks again while a writer is starting up.
+OUTPUT_POLL = 0.1
+
+
+def lock_panel(wait=True):
+    # Held by whichever process talks to the panel over SPI, panel-writer.py
+    # included, so that two of them never do at once.  Waits for the
+    # current holder to let go, or returns None if told not to wait.
+    lock = open(PANEL_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+class WriterOutput:
+    """Hand frames to panel-writer.py, which owns the panel.
+
+    Publishing is a copy into shared memory; this process never waits on
+    the panel, and a crash on either side leaves the other one running.
+    If the writer goes away, frames go to a restarted writer or straight
+    to the panel from then on, rather than into shared memory nobody
+    reads."""
+
+    def __init__(self, fb):
+        self.fb = fb
+        self.fallback = None
+
+    def show(self, frame):
+        if self.fallback is None and not self.fb.writer_alive():
+            logging.info('panel writer is gone')
+            self.fb.close()
+            self.fb = None
+            self.fallback = open_output()
+
+        if self.fallback is not None:
+            self.fallback.show(frame)
+        else:
+            self.fb.publish(frame)
+
+    def rest(self):
+        # The writer powers the panel down by itself.
+        if self.fallback is not None:
+            self.fallback.rest()
+
+    def close(self):
+        if self.fb is not None:
+            self.fb.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+class PanelOutput:
+    """Drive the panel from this process, when there is no writer.
+
+    The panel stays powered after a refresh, so that the next one can start
+    right away, until rest() or close()."""
+
+    def __init__(self, lock):
+        # Only now, so that processes which hand their frames to the
+        # writer never touch GPIO or SPI.
+        from waveshare_epd.panel import Panel
+
+        # from lock_panel()
+        self.lock = lock
+
+        # Initialize the e-ink Display and associated data structures
+        self.epd = Panel(EPD2IN7)
+        self.epd.init()
+
+    def show(self, frame):
+        self.epd.display(frame)
+
+    def rest(self):
+        # Power off, but stay initialized for the next frame
+        if self.epd.powered:
+            self.epd.standby()
+
+    def close(self):
+        self.epd.sleep()
+        self.lock.close()
+
+
+def open_output():
+    # A writer to hand frames to if there is one, or else the panel to
+    # ourselves.  A writer that is starting up holds the panel lock for a
+    # while before its frames can be attached to, so keep trying both
+    # rather than wait on the lock.
+    while True:
+        fb = FrameBuffer.attach(FRAME_SHM_NAME, EPD2IN7.frame_size)
+        if fb is not None:
+            return WriterOutput(fb)
+
+        lock = lock_panel(wait=False)
+        if lock is not None:
+            return PanelOutput(lock)
+
+        time.sleep(OUTPUT_POLL)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Owns the e-Paper panel, and shows whatever frames update-display.py
+# publishes into shared memory.  With this running, rendering and data
+# fetching never wait on a panel refresh (or its BUSY waits), and a crash
+# in one does not take the other down.  update-display.py drives the panel
+# itself whenever this is not running.
+
+import logging
+import time
+
+from framebuffer import FrameBuffer
+from output import lock_panel
+from runlock import single_run
+from settings import (FRAME_SHM_NAME, WRITER_POLL_MS, PANEL_AWAKE,
+                      WRITER_LOCK_FILE)
+from waveshare_epd.models import EPD2IN7
+from waveshare_epd.panel import Panel
+
+
+def main():
+    # If update-display.py is driving the panel itself right now, wait for
+    # it to finish; one that keeps running (--keys) keeps the panel.
+    panel_lock = lock_panel()
+
+    epd = Panel(EPD2IN7)
+    epd.init()
+
+    fb = FrameBuffer.create(FRAME_SHM_NAME, EPD2IN7.frame_size)
+    seen = None
+    shown = time.monotonic()
+
+    try:
+        while True:
+            frame, seq = fb.claim(seen)
+            if frame is None:
+                # Stay powered for a while after a refresh, so that a key
+                # press in update-display.py --keys shows up right away.
+                if epd.powered and time.monotonic() - shown > PANEL_AWAKE:
+                    epd.standby()
+                time.sleep(WRITER_POLL_MS / 1000)
+                continue
+
+            # The frame goes to SPI straight out of shared memory; the
+            # renderer writes its next one into the other slot meanwhile.
+            try:
+                epd.display(frame)
+            finally:
+                frame.release()
+                fb.release()
+            seen = seq
+            shown = time.monotonic()
+
+    except KeyboardInterrupt:
+        logging.info("ctrl + c:")
+
+    finally:
+        epd.sleep()
+        fb.close()
+        fb.unlink()
+        panel_lock.close()
+
+
+if __name__ == '__main__':
+    with single_run(WRITER_LOCK_FILE, 0):
+        main()
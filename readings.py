@@ -0,0 +1,59 @@
+from loadprofile import MAX_RUNTIME
+from settings import BATTERY_CAPACITY
+
+INFINITY = '\u221e'  # infinity symbol
+
+
+def derive(values, profile=None):
+    # Take the averages we got out of InfluxDB (or the cache) and work out
+    # everything else the pages show.  'values' is a dict with battery_soc,
+    # pv_power, battery_flow, pv_yield, pv_power_15m, battery_flow_15m and
+    # time; a copy of it comes back with the derived values added.  With a
+    # LoadProfile the runtime comes from that rather than the 15m draw.
+    readings = dict(values)
+
+    # Normalize any negative PV readings to zero.  Not saying those values
+    # are invalid, but they are usually very small in magnitude and they
+    # are non-intuitive, so lets exclude them from the display.
+
+    if readings['pv_power'] < 0:
+        readings['pv_power'] = 0
+
+    # Calculate how much power is being consumed.  The panel will not
+    # generate power if it goes nowhere, so it goes to load or to battery.
+    # So we can subtract the flow to the battery from the yield from the
+    # panel and this is our power draw.  We calculate the value for the last
+    # 3 minutes to use on the display, and the value for the last 15 minutes
+    # to use in our runtime guesser.
+
+    readings['power_draw'] = readings['pv_power'] - readings['battery_flow']
+    readings['power_draw_15m'] = (readings['pv_power_15m'] -
+                                  readings['battery_flow_15m'])
+
+    # Work out how long we could run without any more sunlight.  The load
+    # profile knows the fridge and heater come and go and what the evening
+    # looks like, so walk that forward from now.  Until it has seen some
+    # data, make a wild ass guess instead: assume we keep consuming the same
+    # average power we have been consuming for the past 15 minutes.  If that
+    # is negative (or zero) the battery is charging, and we run forever.
+
+    remaining = BATTERY_CAPACITY * readings['battery_soc'] / 100
+    runtime = None
+    if profile is not None:
+        runtime = profile.runtime(readings['time'], remaining)
+    if runtime is None and readings['power_draw_15m'] > 0:
+        runtime = remaining / readings['power_draw_15m']
+
+    if runtime is None or runtime > MAX_RUNTIME:
+        readings['runtime'] = INFINITY
+    else:
+        readings['runtime'] = round(runtime)
+
+    if readings['battery_flow'] > 0:
+        readings['battery_state'] = 'Charging'
+    elif readings['battery_flow'] < 0:
+        readings['battery_state'] = 'Discharging'
+    else:
+        readings['battery_state'] = 'Resting'
+
+    return readings
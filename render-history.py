@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# Regenerate what the display would have shown over a stretch of recorded
+# data, for tuning the layout and for catching rendering changes.  Each
+# frame's inputs are worked out from the recorded series the same way
+# InfluxDB would have answered update-display.py's queries at that moment,
+# and the frames are rendered in parallel on every core.
+#
+# Writes frameNNNNN.png files, an animated timelapse.gif, and manifest.json
+# with a hash of every frame's pixels.  Comparing two manifests shows
+# exactly which frames a rendering change touched.
+
+import argparse
+import bisect
+import csv
+import datetime
+import hashlib
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pytz
+from PIL import Image
+
+from history import History
+from loadprofile import LoadProfile
+from readings import derive
+from render import PAGES, render_page
+from settings import (TIMEZONE, BATTERY_SOC_FIELD, PV_POWER_FIELD,
+                      BATTERY_FLOW_FIELD, BACKFILL_CHUNK_SIZE)
+
+FIELDS = (BATTERY_SOC_FIELD, PV_POWER_FIELD, BATTERY_FLOW_FIELD)
+
+# Set in each worker process, for the history page.
+HISTORY = None
+
+
+class Series:
+    """One field's samples, with running sums so that any window's mean
+    and integral come out of two binary searches rather than a scan."""
+
+    def __init__(self):
+        self.times = array('d')
+        self.values = array('d')
+
+    def append(self, t, value):
+        self.times.append(t)
+        self.values.append(value)
+
+    def finish(self):
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        self.times = array('d', (self.times[i] for i in order))
+        self.values = array('d', (self.values[i] for i in order))
+
+        # sums[i] is the sum of the first i values, and area[i] the
+        # trapezoidal integral (watt hours) up to sample i.
+        self.sums = array('d', [0.0])
+        self.area = array('d', [0.0])
+        for i, value in enumerate(self.values):
+            self.sums.append(self.sums[-1] + value)
+            if i:
+                dt = self.times[i] - self.times[i - 1]
+                step = (value + self.values[i - 1]) / 2 * dt / 3600
+                self.area.append(self.area[-1] + step)
+
+    def window(self, start, end):
+        return (bisect.bisect_left(self.times, start),
+                bisect.bisect_right(self.times, end))
+
+    def mean(self, start, end):
+        # Same as get_average(): 0 when there are no samples
+        lo, hi = self.window(start, end)
+        if hi <= lo:
+            return 0
+        return round((self.sums[hi] - self.sums[lo]) / (hi - lo))
+
+    def integral(self, start, end):
+        # Same as get_yield()'s INTEGRAL("value", 60m)
+        lo, hi = self.window(start, end)
+        if hi - lo < 2:
+            return 0
+        return round(self.area[hi - 1] - self.area[lo])
+
+
+def load_csv(path):
+    # The format 'influx -format csv' exports: name,time,value, with time
+    # in nanoseconds (seconds are fine too).
+    series = {field: Series() for field in FIELDS}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['name'] in series and row['value'] != '':
+                t = float(row['time'])
+                if t > 1e12:
+                    t /= 1e9
+                series[row['name']].append(t, float(row['value']))
+    return series
+
+
+def load_influx(start, end):
+    from datasource import connect, stream_points
+
+    client = connect()
+    series = {field: Series() for field in FIELDS}
+    for field in FIELDS:
+        # reach back far enough for the first frame's averages and yield
+        for t, value in stream_points(client=client, field=field,
+                                      start=int(start) - 86400, end=int(end),
+                                      chunk_size=BACKFILL_CHUNK_SIZE):
+            if value is not None:
+                series[field].append(t, value)
+    return series
+
+
+def frame_inputs(series, profile, t, tz):
+    # What update-display.py's fetch_readings() would have come back with
+    # at time t, short of the staleness, which does not apply here.  Frames
+    # are worked out in time order, so the load profile builds up just as
+    # it did on the display.
+    now = datetime.datetime.fromtimestamp(t, tz)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    soc, pv, flow = (series[field] for field in FIELDS)
+
+    battery_soc = soc.mean(t - 180, t)
+    if not battery_soc:
+        return None
+
+    readings = derive({'time': now,
+                       'stale_minutes': None,
+                       'battery_soc': battery_soc,
+                       'pv_power': pv.mean(t - 180, t),
+                       'battery_flow': flow.mean(t - 180, t),
+                       'pv_yield': pv.integral(midnight.timestamp(), t),
+                       'pv_power_15m': pv.mean(t - 900, t),
+                       'battery_flow_15m': flow.mean(t - 900, t)}, profile)
+
+    profile.update(now, readings['power_draw'])
+    return readings
+
+
+def build_history(series):
+    # The hourly averages backfill-history.py would have kept, for the
+    # whole stretch at once.  The history page only looks at hours that
+    # were over by the time of its frame, so no frame sees ahead.
+    history = History(os.devnull)
+    chunk = history.slice()
+    for field, s in series.items():
+        for t, value in zip(s.times, s.values):
+            chunk.add(field, int(t), value)
+    history.hourly = chunk.hourly
+    return history
+
+
+def init_worker(history):
+    global HISTORY
+    HISTORY = history
+
+
+def render_frame(job):
+    # Runs in a worker process.
+    index, page, readings, out_dir = job
+    image = render_page(page, readings, HISTORY)
+
+    path = os.path.join(out_dir, f'frame{index:05d}.png')
+    image.save(path)
+    return {'frame': index,
+            'time': readings['time'].isoformat(),
+            'page': page,
+            'file': os.path.basename(path),
+            'sha256': hashlib.sha256(image.tobytes()).hexdigest()}
+
+
+def parse_time(value, tz):
+    when = datetime.datetime.fromisoformat(value)
+    if when.tzinfo is None:
+        when = tz.localize(when)
+    return when.timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Render what the display showed over a period of time')
+    parser.add_argument('start', help='local time, e.g. 2021-06-01T00:00')
+    parser.add_argument('end', help='local time, e.g. 2021-06-02T00:00')
+    parser.add_argument('--csv', help='read samples from an influx csv '
+                                      'export instead of InfluxDB')
+    parser.add_argument('--step', type=int, default=180,
+                        help='seconds between frames (default: 180)')
+    parser.add_argument('--page', default='overview',
+                        choices=[name for name, render in PAGES])
+    parser.add_argument('--out', default='frames')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--gif-ms', type=int, default=100,
+                        help='milliseconds per timelapse frame')
+    args = parser.parse_args()
+
+    tz = pytz.timezone(TIMEZONE)
+    start = parse_time(args.start, tz)
+    end = parse_time(args.end, tz)
+
+    if args.csv:
+        series = load_csv(args.csv)
+    else:
+        series = load_influx(start, end)
+    for s in series.values():
+        s.finish()
+
+    os.makedirs(args.out, exist_ok=True)
+
+    # Working out the inputs is a handful of binary searches per frame, so
+    # it stays here; the rendering is what gets farmed out.
+    jobs = []
+    profile = LoadProfile()
+    t = start
+    while t <= end:
+        readings = frame_inputs(series, profile, t, tz)
+        if readings is not None:
+            jobs.append((len(jobs), args.page, readings, args.out))
+        t += args.step
+
+    # Handed to each worker once, rather than pickled into every job.
+    history = build_history(series) if args.page == 'history' else None
+
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             initializer=init_worker,
+                             initargs=(history,)) as pool:
+        manifest = list(pool.map(render_frame, jobs,
+                                 chunksize=max(1, len(jobs) // 64)))
+
+    with open(os.path.join(args.out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    if manifest:
+        frames = (Image.open(os.path.join(args.out, entry['file']))
+                  for entry in manifest)
+        first = next(frames)
+        first.save(os.path.join(args.out, 'timelapse.gif'), save_all=True,
+                   append_images=frames, duration=args.gif_ms, loop=0)
+
+    print(f'{len(manifest)} frames written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# Drawing the display pages.  Every page is a 264x176 landscape image the
+# right way up; turning it to suit the panel is up to whoever shows it.
+
+import datetime
+import functools
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+from settings import PV_POWER_FIELD, BATTERY_SOC_FIELD
+
+WIDTH = 264
+HEIGHT = 176
+
+FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'monaco.dfont')
+
+
+@functools.lru_cache(maxsize=None)
+def font(size):
+    return ImageFont.truetype(FONT_FILE, size)
+
+
+def text_width(draw, text, font):
+    # textsize() is gone from recent Pillow releases
+    if hasattr(draw, 'textbbox'):
+        return draw.textbbox((0, 0), text, font=font)[2]
+    return draw.textsize(text, font=font)[0]
+
+
+def centered(draw, y, text, font):
+    w = text_width(draw, text, font)
+    draw.text(((WIDTH - w) / 2, y), text, font=font, fill='black')
+
+
+def right_aligned(draw, y, text, font):
+    w = text_width(draw, text, font)
+    draw.text((WIDTH - w - 5, y), text, font=font, fill='black')
+
+
+def rule(draw, y):
+    draw.line((10, y, 254, y), fill='black')
+    draw.line((10, y + 1, 254, y + 1), fill='black')
+
+
+def stale_marker(draw, readings):
+    # Mark the display when some of what it shows came out of the cache
+    # rather than from InfluxDB, so nobody trusts old numbers.
+    if readings.get('stale_minutes') is not None:
+        draw.text((2, 2), f'{readings["stale_minutes"]}m old',
+                  font=font(12), fill='black')
+
+
+def new_page():
+    image = Image.new('1', (WIDTH, HEIGHT), 255)
+    return image, ImageDraw.Draw(image)
+
+
+def stale_text(readings):
+    if readings.get('stale_minutes') is None:
+        return ''
+    return f'{readings["stale_minutes"]}m old'
+
+
+# The overview is a fixed set of single line text fields and rules, so that
+# bitmap.py can draw exactly the same page straight into the panel's byte
+# layout.  Each field is (font size, y, alignment, text for the readings).
+
+OVERVIEW_FIELDS = [
+    (80, -10, 'center', lambda r: f'{r["battery_soc"]}%'),
+    (50, 81, 'center', lambda r: f'{r["runtime"]} Hours'),
+    (25, 143, 'left', lambda r: f'\u2192{r["pv_power"]}W'),
+    (25, 143, 'center', lambda r: f'{r["pv_yield"]}Wh'),
+    (25, 143, 'right', lambda r: f'{r["power_draw"]}W\u2192'),
+    (12, 2, 'corner', stale_text),
+]
+
+OVERVIEW_RULES = (83, 140)
+
+
+@functools.lru_cache(maxsize=None)
+def advance(font, char):
+    # Whole pixels, so that every character lands on the same pixel grid
+    # here and in bitmap.py.
+    return round(font.getlength(char))
+
+
+def field_x(align, width):
+    if align == 'left':
+        return 5
+    if align == 'right':
+        return WIDTH - width - 5
+    if align == 'corner':
+        return 2
+    return (WIDTH - width) // 2
+
+
+def field(draw, y, align, text, font):
+    # One character at a time, each at a whole pixel position.
+    x = field_x(align, sum(advance(font, char) for char in text))
+    for char in text:
+        draw.text((x, y), char, font=font, fill='black')
+        x += advance(font, char)
+
+
+def render_overview(readings, history=None):
+    image, draw = new_page()
+
+    for size, y, align, text in OVERVIEW_FIELDS:
+        field(draw, y, align, text(readings), font(size))
+
+    for y in OVERVIEW_RULES:
+        rule(draw, y)
+
+    return image
+
+
+def render_detail(title, headline, rows, readings):
+    # The detail pages share one layout: a title, one big number, and a
+    # few label/value rows underneath.
+    image, draw = new_page()
+
+    right_aligned(draw, 2, title, font(14))
+    centered(draw, 8, headline, font(50))
+    rule(draw, 66)
+
+    for i, (label, value) in enumerate(rows):
+        y = 72 + i * 26
+        draw.text((10, y), label, font=font(20), fill='black')
+        right_aligned(draw, y, value, font(20))
+
+    stale_marker(draw, readings)
+    return image
+
+
+def render_solar(readings, history=None):
+    rows = [('15m avg', f'{readings["pv_power_15m"]}W'),
+            ('Today', f'{readings["pv_yield"]}Wh')]
+
+    if history is not None:
+        yesterday = readings['time'].date() - datetime.timedelta(days=1)
+        rows.append(('Yesterday', f'{history.daily_yield(yesterday)}Wh'))
+
+    return render_detail('SOLAR', f'{readings["pv_power"]}W', rows, readings)
+
+
+def render_battery(readings, history=None):
+    rows = [(readings['battery_state'], f'{readings["battery_flow"]}W'),
+            ('15m avg', f'{readings["battery_flow_15m"]}W'),
+            ('Draw', f'{readings["power_draw"]}W'),
+            ('Runtime', f'{readings["runtime"]} Hours')]
+
+    return render_detail('BATTERY', f'{readings["battery_soc"]}%', rows,
+                         readings)
+
+
+def render_history(readings, history=None):
+    # Solar power as bars and SOC as a line, hourly over the last day.
+    image, draw = new_page()
+    right_aligned(draw, 2, '24H SOLAR/SOC', font(14))
+    stale_marker(draw, readings)
+
+    top, bottom = 22, 170
+    draw.line((10, bottom, 254, bottom), fill='black')
+
+    if history is None:
+        return image
+
+    end = int(readings['time'].timestamp())
+    pv = history.hourly_means(PV_POWER_FIELD, end)
+    soc = history.hourly_means(BATTERY_SOC_FIELD, end)
+
+    if not any(pv):
+        return image
+
+    peak = max(p for p in pv if p)
+    for i, power in enumerate(pv):
+        if power:
+            x = 12 + i * 10
+            y = bottom - (bottom - top) * power / peak
+            draw.rectangle((x, y, x + 6, bottom), fill='black')
+
+    points = [(15 + i * 10, bottom - (bottom - top) * level / 100)
+              for i, level in enumerate(soc) if level is not None]
+    if len(points) > 1:
+        draw.line(points, fill='black', width=3)
+        draw.line(points, fill='white', width=1)
+
+    draw.text((10, top - 2), f'{round(peak)}W', font=font(12), fill='black')
+    return image
+
+
+PAGES = [
+    ('overview', render_overview),
+    ('solar', render_solar),
+    ('battery', render_battery),
+    ('history', render_history),
+]
+
+
+def render_pages(readings, history=None):
+    return [render(readings, history) for name, render in PAGES]
+
+
+def render_page(name, readings, history=None):
+    return dict(PAGES)[name](readings, history)
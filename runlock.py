@@ -0,0 +1,35 @@
+# Keeping the scripts from running on top of each other.  Standard library
+# only, so that display-client.py can use it without pulling in InfluxDB.
+
+import contextlib
+import fcntl
+import logging
+import signal
+import sys
+
+
+class RunExpired(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def single_run(lock_file, deadline):
+    # Make sure only one copy of us is running, and that this copy cannot
+    # outlive its slot in the crontab.
+    with open(lock_file, 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logging.info('previous run still in progress, skipping')
+            sys.exit(0)
+
+        def expired(signum, frame):
+            raise RunExpired(f'run exceeded {deadline} seconds')
+
+        previous = signal.signal(signal.SIGALRM, expired)
+        signal.alarm(deadline)
+        try:
+            yield
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
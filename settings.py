@@ -0,0 +1,106 @@
+# Site configuration shared by update-display.py and its helper modules.
+
+TIMEZONE = 'US/Pacific'
+INFLUX_HOSTNAME = '10.11.12.51'
+INFLUX_PORT = 8086
+INFLUX_DATABASE = 'venus'
+BATTERY_SOC_FIELD = 'battery/Soc'
+PV_POWER_FIELD = 'system/Dc/Pv/Power'
+BATTERY_FLOW_FIELD = 'battery/Dc/0/Power'
+BATTERY_CAPACITY = 1200
+
+UPDATE_DISPLAY = True
+
+# How long a single HTTP request to InfluxDB may take, in seconds.  The
+# WiFi link between the two Pis drops now and then, and without a timeout
+# a query will happily sit there until the next cron run piles up on it.
+INFLUX_TIMEOUT = 10
+
+# How many times to try a query before giving up on it, and the base delay
+# (in seconds) for the exponential backoff between attempts.
+INFLUX_RETRIES = 3
+INFLUX_BACKOFF = 0.5
+
+# The cron job runs every 3 minutes, so no single run may take longer than
+# this many seconds.  Anything still running at that point gets killed so
+# it cannot overlap with the next one.
+RUN_DEADLINE = 170
+LOCK_FILE = '/tmp/pi-display.lock'
+
+# Held by update-display.py --serve, the render server, for as long as it
+# runs.
+SERVE_LOCK_FILE = '/tmp/pi-display-server.lock'
+
+# Held by panel-writer.py, and by backfill-history.py: one lock for this
+# display's own history, and one per render server site.
+WRITER_LOCK_FILE = '/tmp/pi-display-writer.lock'
+BACKFILL_LOCK_FILE = '/tmp/pi-display-backfill.lock'
+BACKFILL_SITE_LOCK_FILE = '/tmp/pi-display-backfill-{site}.lock'
+
+# Last-known-good values, used when InfluxDB cannot be reached.
+CACHE_FILE = 'cache.json'
+
+# Locally kept hourly averages and daily solar yield, rebuilt from InfluxDB
+# by backfill-history.py after the display has been offline.
+HISTORY_FILE = 'history.json'
+HISTORY_DAYS = 7
+
+# Backfill pulls history in slices of this many hours, streaming each slice
+# back from InfluxDB in chunks of this many points, so memory use stays flat
+# however long we were offline.
+BACKFILL_SLICE_HOURS = 6
+BACKFILL_CHUNK_SIZE = 2000
+
+# The four keys down the side of the 2.7" HAT (BCM numbering), top to
+# bottom.  Each one selects a page, in the order of render.PAGES.
+KEY_PINS = (5, 6, 13, 19)
+KEY_BOUNCE_MS = 200
+
+# How often update-display.py --keys fetches new data, in seconds.
+UPDATE_INTERVAL = 180
+
+# How long the panel stays powered after a refresh, in seconds, in case
+# another one follows: a key press then goes straight to the refresh
+# (about 25 ms) instead of powering up first (about 115 ms).  Waveshare
+# advise against leaving it powered for long stretches.
+PANEL_AWAKE = 60
+
+# Hour-of-week consumption profile behind the runtime estimate.  Each of
+# the 168 buckets is an exponentially weighted average of the power draw
+# seen in that hour; at one sample per run this weights roughly the last
+# week's worth of that hour the most.
+PROFILE_FILE = 'loadprofile.bin'
+PROFILE_ALPHA = 0.05
+
+# When panel-writer.py is running it owns the panel, and everything else
+# hands it packed frames through this shared memory block instead.
+FRAME_SHM_NAME = 'pi-display-frames'
+WRITER_POLL_MS = 10
+
+# Whoever drives the panel over SPI holds this: the writer, or a process
+# showing its frames directly because no writer was running.
+PANEL_LOCK_FILE = '/tmp/pi-display-panel.lock'
+
+# Draw the overview page straight into a packed frame from pre-built
+# sprites (bitmap.py) instead of with Pillow.  output.png is only written
+# when this is off.
+BITMAP_RENDERER = True
+
+# Render server (update-display.py --serve): one host fetches and renders
+# for every site below and serves the packed frames over HTTP, and the
+# display Pis just run display-client.py.  Each site is a Venus GX with its
+# own InfluxDB; its cache, history and load profile live in SITE_DIR/name.
+SITES = {
+    'home': {'hostname': INFLUX_HOSTNAME,
+             'port': INFLUX_PORT,
+             'database': INFLUX_DATABASE},
+}
+SITE_DIR = 'sites'
+SERVE_PORT = 8027
+
+# Where display-client.py gets its frames from, which site's it shows, and
+# how often it asks (in seconds).  Asking is cheap: until the frame
+# changes the server only answers 'not modified'.
+SERVER_URL = 'http://10.11.12.50:8027'
+SITE = 'home'
+CLIENT_POLL = 20
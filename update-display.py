@@ -1,216 +1,300 @@
 #!/usr/bin/env python3
 
+import argparse
 import datetime
 import logging
+import os
+import queue
+import threading
+import time
 import pytz
 
-from influxdb import InfluxDBClient
-from PIL import Image, ImageDraw, ImageFont
-
-TIMEZONE = 'US/Pacific'
-INFLUX_HOSTNAME = '10.11.12.51'
-INFLUX_PORT = 8086
-INFLUX_DATABASE = 'venus'
-BATTERY_SOC_FIELD = 'battery/Soc'
-PV_POWER_FIELD = 'system/Dc/Pv/Power'
-BATTERY_FLOW_FIELD = 'battery/Dc/0/Power'
-BATTERY_CAPACITY = 1200
+from bitmap import BitmapRenderer
+from datasource import ValueCache, connect, get_average, get_yield
+from frameserver import FrameServer, FrameStore
+from history import History
+from keys import watch_keys
+from loadprofile import LoadProfile
+from output import open_output
+from readings import derive
+from render import PAGES, render_overview
+from runlock import RunExpired, single_run
+from settings import (TIMEZONE, BATTERY_SOC_FIELD, PV_POWER_FIELD,
+                      BATTERY_FLOW_FIELD, UPDATE_DISPLAY, RUN_DEADLINE,
+                      LOCK_FILE, CACHE_FILE, HISTORY_FILE, UPDATE_INTERVAL,
+                      PROFILE_FILE, BITMAP_RENDERER, PANEL_AWAKE, SITES,
+                      SITE_DIR, SERVE_PORT, SERVE_LOCK_FILE)
+from waveshare_epd.models import EPD2IN7
+from waveshare_epd.panelmodel import pack as pack_frame
+
+
+def fetch_readings(client, cache, profile_file=PROFILE_FILE):
+    # Get the local time
+    now = datetime.datetime.now(tz=pytz.timezone(TIMEZONE))
+    cache.retry()
+
+    # Grab data out of InfluxDB.  If it cannot be reached, fall back on the
+    # last values we did get, and flag the display as stale.
+
+    # A zero reading on the SOC means we do not have any data samples in the
+    # last 3 minutes.  This should not often happen unless there is a
+    # networking problem between the Influx poller and the Venus server, so
+    # treat it the same as not being able to reach InfluxDB at all.
+    battery_soc = cache.fetch('battery_soc', get_average, missing=0,
+                              client=client, field=BATTERY_SOC_FIELD)
+    pv_power = cache.fetch('pv_power', get_average,
+                           client=client, field=PV_POWER_FIELD)
+    battery_flow = cache.fetch('battery_flow', get_average,
+                               client=client, field=BATTERY_FLOW_FIELD)
+    pv_yield = cache.fetch('pv_yield', get_yield, client=client)
+
+    pv_power_15m = cache.fetch('pv_power_15m', get_average, client=client,
+                               field=PV_POWER_FIELD, duration='15m')
+    battery_flow_15m = cache.fetch('battery_flow_15m', get_average,
+                                   client=client, field=BATTERY_FLOW_FIELD,
+                                   duration='15m')
+
+    # If we have neither a fresh nor a cached SOC there is nothing sensible
+    # to show, so leave the display alone.
+
+    if not battery_soc or None in (pv_power, battery_flow, pv_yield,
+                                   pv_power_15m, battery_flow_15m):
+        return None
+
+    cache.save()
+
+    profile = LoadProfile(profile_file)
+    readings = derive({'time': now,
+                       'stale_minutes': cache.staleness(),
+                       'battery_soc': battery_soc,
+                       'pv_power': pv_power,
+                       'battery_flow': battery_flow,
+                       'pv_yield': pv_yield,
+                       'pv_power_15m': pv_power_15m,
+                       'battery_flow_15m': battery_flow_15m}, profile)
+
+    # Only fresh numbers go into the load profile, one sample per run.
+    if readings['stale_minutes'] is None:
+        profile.update(now, readings['power_draw'])
+        profile.save()
+
+    return readings
+
+
+def log_readings(r):
+    with open('output.txt', 'a') as f:
+        f.write(f'\n============ {r["time"].strftime("%m/%d %H:%M")} ============\n')
+        if r['stale_minutes'] is not None:
+            f.write(f'Stale: using cached values up to {r["stale_minutes"]} minutes old\n')
+        f.write(f'Battery SOC: {r["battery_soc"]}%\n')
+        f.write(f'Battery Flow (15m Avg): {r["battery_flow"]} Watts ({r["battery_flow_15m"]})\n')
+        f.write(f'Solar Power (15m Avg): {r["pv_power"]} Watts ({r["pv_power_15m"]})\n')
+        f.write(f'Solar Yield: {r["pv_yield"]} Watt Hours\n')
+        f.write(f'Power Draw (15m Avg): {r["power_draw"]} Watts ({r["power_draw_15m"]})\n')
+        f.write(f'Battery State: {r["battery_state"]}\n')
+        f.write(f'Runtime: {r["runtime"]} Hours\n')
 
-UPDATE_DISPLAY = True
 
-if UPDATE_DISPLAY:
-    from waveshare_epd import epd2in7
+def pack(image):
+    # The mounting orientation of the display is upside down
+    return pack_frame(EPD2IN7, image.rotate(180))
 
 
-def get_average(client=None, field=None, duration='3m'):
+def main():
+    output = None
     try:
-        query = (f'SELECT mean("value") FROM "{field}" '
-                 f'WHERE time >= now() - {duration}')
-
-        # query influxdb, which will return a generator
-        result = client.query(query, database=INFLUX_DATABASE)
-
-        # pull out the field we want
-        result = result[(field, None)]
-
-        # convert to a list, grab the first element, which is a dictionary
-        result = list(result)[0]
-
-        # get the value of 'mean', which is what we asked for
-        result = result.get('mean', 0)
-
-        # we do not need sub-integer precision
-        return round(result)
-
-    except IndexError:
-        return 0
-
-
-def get_yield(client=None, field=PV_POWER_FIELD):
-    now = datetime.datetime.now(tz=pytz.timezone(TIMEZONE))
-    midnight = datetime.datetime.now(pytz.timezone('US/Pacific')).replace(
-        hour=0, minute=0, second=0, microsecond=0)
-    minutes_since_midnight = (now - midnight).seconds // 60
+        readings = fetch_readings(connect(), ValueCache(CACHE_FILE))
+        if readings is None:
+            return
+
+        if BITMAP_RENDERER:
+            frame = BitmapRenderer().render_overview(readings)
+        else:
+            image = render_overview(readings)
+            image.save('output.png')
+            frame = pack(image)
+
+        if UPDATE_DISPLAY:
+            output = open_output()
+            output.show(frame)
+
+        log_readings(readings)
+
+    except IOError as e:
+        logging.info(e)
+
+    except (KeyboardInterrupt, RunExpired) as e:
+        logging.info(e or "ctrl + c:")
+
+    finally:
+        if output is not None:
+            output.close()
+
+
+def render_frames(readings, history, bitmap=None, png=None):
+    # Every page in render.PAGES, rendered and packed.  With the bitmap
+    # renderer the overview never goes near Pillow; without it, 'png' is
+    # where to save the overview, if anywhere.
+    frames = []
+    for name, render in PAGES:
+        if name == 'overview' and bitmap is not None:
+            frames.append(bitmap.render_overview(readings))
+            continue
+
+        image = render(readings, history)
+        if name == 'overview' and png is not None:
+            image.save(png)
+        frames.append(pack(image))
+    return frames
+
+
+class PageSwitcher:
+    """Stay running and show whichever page the HAT's keys pick.
+
+    A background thread fetches new data every UPDATE_INTERVAL and renders
+    and packs every page right away.  A key press then only has to pick the
+    packed frame and hand it to the panel: no InfluxDB, no Pillow."""
+
+    def __init__(self, output):
+        self.output = output
+        self.bitmap = BitmapRenderer() if BITMAP_RENDERER else None
+        self.frames = None
+        self.page = 0
+        self.shown = None
+
+        # Page numbers from key presses, and None for 'new data arrived'.
+        self.events = queue.Queue()
+
+    def update(self):
+        client = connect()
+        cache = ValueCache(CACHE_FILE)
+
+        while True:
+            try:
+                readings = fetch_readings(client, cache)
+                if readings is not None:
+                    # Swap in the whole set at once, the display loop only
+                    # ever sees a complete one.
+                    self.frames = render_frames(readings,
+                                                History(HISTORY_FILE),
+                                                self.bitmap, 'output.png')
+                    self.events.put(None)
+                    log_readings(readings)
+
+            except Exception:
+                logging.exception('update failed')
+
+            time.sleep(UPDATE_INTERVAL)
+
+    def run(self):
+        watch_keys(self.events.put)
+        threading.Thread(target=self.update, daemon=True).start()
+
+        while True:
+            # Leave the panel powered for a while after a refresh, ready
+            # for the next key press, then power it down.
+            try:
+                event = self.events.get(timeout=PANEL_AWAKE)
+            except queue.Empty:
+                self.output.rest()
+                event = self.events.get()
+
+            # Presses that came in while the panel was busy refreshing are
+            # stale; only the latest one counts.
+            while not self.events.empty():
+                newer = self.events.get_nowait()
+                if newer is not None or event is None:
+                    event = newer
+
+            frames = self.frames
+            if event is not None and event < len(frames or ()):
+                self.page = event
+
+            if frames is None or frames[self.page] == self.shown:
+                continue
+
+            self.output.show(frames[self.page])
+            self.shown = frames[self.page]
+
+
+def run_keys():
+    output = open_output()
 
     try:
-        query = (f'SELECT INTEGRAL("value", 60m) FROM "{field}" '
-                 f'WHERE time >= now() - {minutes_since_midnight}m')
-
-        # query influxdb, which will return a generator
-        result = client.query(query, database=INFLUX_DATABASE)
-
-        # pull out the field we want
-        result = result[(field, None)]
-
-        # convert to a list, grab the first element, which is a dictionary
-        result = list(result)[0]
-
-        # get the value of 'integral', which is what we asked for
-        result = result.get('integral', 0)
-
-        # we do not need sub-integer precision
-        return round(result)
-
-    except IndexError:
-        return 0
-
-
-# Get the local time
-now = datetime.datetime.now(tz=pytz.timezone(TIMEZONE))
-midnight = datetime.datetime.now(pytz.timezone('US/Pacific')).replace(
-    hour=0, minute=0, second=0, microsecond=0)
-minutes_since_midnight = (now - midnight).seconds // 60
-
-# Grab data out of InfluxDB
-client = InfluxDBClient(INFLUX_HOSTNAME, INFLUX_PORT)
-battery_soc = get_average(client=client, field=BATTERY_SOC_FIELD)
-pv_power = get_average(client=client, field=PV_POWER_FIELD)
-battery_flow = get_average(client=client, field=BATTERY_FLOW_FIELD)
-pv_yield = get_yield(client=client)
-
-pv_power_15m = get_average(client=client, field=PV_POWER_FIELD, duration='15m')
-battery_flow_15m = get_average(client=client, field=BATTERY_FLOW_FIELD,
-                               duration='15m')
-
-# Get average battery in/out flow for last 10 minutes
-battery_flow_10m = get_average(
-    client=client, field=BATTERY_FLOW_FIELD, duration='10m')
-
-# If we got a zero reading on the SOC, just bail out, we do not have
-# any data samples in the last 3 minutes.  This should not often happen
-# unless there is a networking problem between the Influx poller and the
-# Venus server.
-
-if not battery_soc:
-    exit()
-
-# Normalize any negative PV readings to zero.  Not saying those values
-# are invalid, but they are usually very small in magnitude and they
-# are non-intuitive, so lets exclude them from the display.
-
-if pv_power < 0:
-    pv_power = 0
-
-# Calculate how much power is being consumed.  The panel will not generate
-# power if it goes nowhere, so it goes to load or to battery.  So we can
-# subtract the flow to the battery from the yield from the panel and this
-# is our power draw.  We calculate the value for the last 3 minutes to use
-# on the display, and the value for the last 15 minutes to use in our
-# runtime guesser.
-
-power_draw = pv_power - battery_flow
-power_draw_15m = pv_power_15m - battery_flow_15m
-
-# Make a wild ass guess as to how long we could run without any more
-# sunlight if we consume the same average power we have been consuming for
-# the past 15 minutes.
-
-runtime = round((BATTERY_CAPACITY * battery_soc / 100) / power_draw_15m)
-
-# If the remaining time is negative, then power draw is negative, which means
-# the battery is charging.
-
-if runtime < 0:
-    runtime = '\u221e'  # infinity symbol
-
-try:
-    if UPDATE_DISPLAY:
-        # Initialize the e-ink Display and associated data structures
-        epd = epd2in7.EPD()
-        epd.init()
-
-    if UPDATE_DISPLAY:
-        img_height = epd.height
-        img_width = epd.width
-    else:
-        img_height = 264
-        img_width = 176
-
-    image = Image.new('1', (img_height, img_width), 255)
-    draw = ImageDraw.Draw(image)
-
-    small_font = ImageFont.truetype('monaco.dfont', 25)
-    medium_font = ImageFont.truetype('monaco.dfont', 50)
-    big_font = ImageFont.truetype('monaco.dfont', 80)
-
-    if battery_flow > 0:
-        battery_state = 'Charging'
-    elif battery_flow < 0:
-        battery_state = 'Discharging'
+        PageSwitcher(output).run()
+    except KeyboardInterrupt:
+        logging.info("ctrl + c:")
+    finally:
+        output.close()
+
+
+def site_file(site, name):
+    return os.path.join(SITE_DIR, site, name)
+
+
+def update_site(site, config, store, bitmap):
+    # The render server's counterpart of PageSwitcher.update(), one thread
+    # per site so that a site whose InfluxDB is unreachable only holds up
+    # its own frames.
+    client = connect(**config)
+    cache = ValueCache(site_file(site, CACHE_FILE))
+
+    while True:
+        try:
+            readings = fetch_readings(client, cache,
+                                      site_file(site, PROFILE_FILE))
+            if readings is not None:
+                frames = render_frames(readings,
+                                       History(site_file(site, HISTORY_FILE)),
+                                       bitmap)
+                store.publish(site, {name: frame for (name, render), frame
+                                     in zip(PAGES, frames)})
+
+        except Exception:
+            logging.exception(f'{site}: update failed')
+
+        time.sleep(UPDATE_INTERVAL)
+
+
+def serve(port):
+    # Fetch and render for every site in SITES, and serve the frames to
+    # display-client.py on each site's display.
+    store = FrameStore()
+    bitmap = BitmapRenderer() if BITMAP_RENDERER else None
+
+    for site, config in SITES.items():
+        os.makedirs(os.path.join(SITE_DIR, site), exist_ok=True)
+        threading.Thread(target=update_site,
+                         args=(site, config, store, bitmap),
+                         daemon=True).start()
+
+    server = FrameServer(('', port), store)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("ctrl + c:")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update the e-Paper display')
+    parser.add_argument('--keys', action='store_true',
+                        help='keep running, switching pages with the keys')
+    parser.add_argument('--serve', action='store_true',
+                        help='render for every site and serve the frames '
+                             'to display-client.py')
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    args = parser.parse_args()
+
+    if args.serve:
+        with single_run(SERVE_LOCK_FILE, 0):
+            serve(args.port)
+    elif args.keys:
+        # Holding the lock also keeps the crontab entry from fighting us
+        # for the panel.
+        with single_run(LOCK_FILE, 0):
+            run_keys()
     else:
-        battery_state = 'Resting'
-
-    image = Image.new('1', (264, 176), 255)
-    draw = ImageDraw.Draw(image)
-
-    h, w = draw.textsize(f'{battery_soc}%', font=big_font)
-    draw.text(((img_height-h)/2, -10), f'{battery_soc}%',
-              font=big_font, fill='black')
-
-    draw.text((5, 143), f'\u2192{pv_power}W',
-              font=small_font, fill='black')
-
-    h, w = draw.textsize(f'{power_draw}W\u2192', font=small_font)
-    draw.text((img_height-h-5, 143), f'{power_draw}W\u2192',
-              font=small_font, fill='black')
-
-    h, w = draw.textsize(f'{pv_yield}Wh', font=small_font)
-    draw.text(((img_height-h)/2, 143), f'{pv_yield}Wh',
-              font=small_font, fill='black')
-
-    h, w = draw.textsize(f'{runtime} Hours', font=medium_font)
-    draw.text(((img_height-h)/2, 81), f'{runtime} Hours',
-              font=medium_font, fill='black')
-
-    draw.line((10, 83, 254, 83), fill='black')
-    draw.line((10, 84, 254, 84), fill='black')
-
-    draw.line((10, 140, 254, 140), fill='black')
-    draw.line((10, 141, 254, 141), fill='black')
-
-    image.save('output.png')
-
-    if UPDATE_DISPLAY:
-        # The mounting orientation of the display is upside down
-        image = image.rotate(180)
-
-    if UPDATE_DISPLAY:
-        epd.display(epd.getbuffer(image))
-        epd.sleep()
-
-    with open('output.txt', 'a') as f:
-        f.write(f'\n============ {now.strftime("%m/%d %H:%M")} ============\n')
-        f.write(f'Battery SOC: {battery_soc}%\n')
-        f.write(f'Battery Flow (15m Avg): {battery_flow} Watts ({battery_flow_15m})\n')
-        f.write(f'Solar Power (15m Avg): {pv_power} Watts ({pv_power_15m})\n')
-        f.write(f'Solar Yield: {pv_yield} Watt Hours\n')
-        f.write(f'Power Draw (15m Avg): {power_draw} Watts ({power_draw_15m})\n')
-        f.write(f'Battery State: {battery_state}\n')
-        f.write(f'Runtime: {runtime} Hours\n')
-
-except IOError as e:
-    logging.info(e)
-
-except KeyboardInterrupt:
-    logging.info("ctrl + c:")
-    epd2in7.epdconfig.module_exit()
+        with single_run(LOCK_FILE, RUN_DEADLINE):
+            main()
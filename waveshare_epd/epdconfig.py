@@ -40,6 +40,8 @@ class RaspberryPi:
     CS_PIN          = 8
     BUSY_PIN        = 24
 
+    SPI_SPEED_HZ    = 4000000
+
     def __init__(self):
         import spidev
         import RPi.GPIO
@@ -72,7 +74,7 @@ class RaspberryPi:
 
         # SPI device, bus = 0, device = 0
         self.SPI.open(0, 0)
-        self.SPI.max_speed_hz = 4000000
+        self.SPI.max_speed_hz = self.SPI_SPEED_HZ
         self.SPI.mode = 0b00
         return 0
 
@@ -146,7 +148,223 @@ class JetsonNano:
         self.GPIO.cleanup()
 
 
-if os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835'):
+class Emulator:
+    """A virtual 2.7" panel (IL91874 controller) for machines without one.
+
+    Decodes the command/data stream the drivers send, keeps the two frame
+    RAMs and the LUT registers, and rebuilds the image on every refresh.
+    Time is virtual: SPI transfers cost what they would at SPI_SPEED_HZ,
+    refreshes keep BUSY asserted for as long as the loaded LUTs take, and
+    delay_ms() only moves the clock forward.  stats() then gives a fair
+    estimate of how long the real panel would have taken.
+
+    Select it with EPD_BACKEND=emulator.  Set EPD_EMULATOR_DUMP to a
+    directory to get every refreshed frame written there as a PGM file,
+    and EPD_EMULATOR_REALTIME=1 to have delays actually sleep."""
+
+    # Pin definition
+    RST_PIN         = 17
+    DC_PIN          = 25
+    CS_PIN          = 8
+    BUSY_PIN        = 24
+
+    # Python overhead of a single spidev call on a Pi 3B, on top of the
+    # time the bits take on the wire.  Rough, but it is what makes byte
+    # at a time transfers as slow here as they are on the real thing.
+    SPI_CALL_OVERHEAD = 20e-6
+
+    # PLL_CONTROL (0x30) settings to frame rate, from the vendor driver.
+    FRAME_RATES = {0x29: 150, 0x31: 171, 0x39: 200, 0x3A: 100, 0x90: 100}
+    DEFAULT_FRAME_RATE = 50
+
+    # Refresh time when no LUTs have been loaded and the panel would be
+    # running its OTP waveform instead, and time for POWER_ON to settle.
+    OTP_REFRESH_TIME = 6.0
+    POWER_ON_TIME = 0.08
+
+    def __init__(self):
+        self.max_speed_hz = int(os.environ.get('EPD_EMULATOR_SPI_HZ',
+                                               RaspberryPi.SPI_SPEED_HZ))
+        self.dump_dir = os.environ.get('EPD_EMULATOR_DUMP')
+        self.realtime = bool(os.environ.get('EPD_EMULATOR_REALTIME'))
+
+        self.clock = 0.0
+        self.spi_time = 0.0
+        self.busy_time = 0.0
+        self.spi_bytes = 0
+        self.refreshes = 0
+        self.pins = {}
+        self.reset_controller()
+
+        # What is on the glass, one byte per pixel.  Unlike everything in
+        # the controller this survives a reset.
+        self.image = bytearray([0xFF]) * (self.width * self.height)
+
+    def reset_controller(self):
+        self.resize(176, 264)
+        self.luts = {}
+        self.pll = None
+        self.busy_until = 0.0
+        self.command = None
+        self.args = bytearray()
+        self.offset = 0
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.ram = {0x10: bytearray([0xFF]) * (width * height // 8),
+                    0x13: bytearray([0xFF]) * (width * height // 8)}
+
+    def digital_write(self, pin, value):
+        if pin == self.RST_PIN and self.pins.get(pin) == 1 and value == 0:
+            self.reset_controller()
+        self.pins[pin] = value
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            # BUSY is low while the controller is working
+            return 0 if self.clock < self.busy_until else 1
+        return self.pins.get(pin, 0)
+
+    def delay_ms(self, delaytime):
+        self.clock += delaytime / 1000.0
+        if self.realtime:
+            time.sleep(delaytime / 1000.0)
+
+    def spi_writebyte(self, data):
+        elapsed = self.SPI_CALL_OVERHEAD + len(data) * 8 / self.max_speed_hz
+        self.clock += elapsed
+        self.spi_time += elapsed
+        self.spi_bytes += len(data)
+
+        if self.pins.get(self.DC_PIN):
+            for byte in data:
+                self.data(byte)
+        else:
+            for byte in data:
+                self.begin(byte)
+
+    spi_writebyte2 = spi_writebyte
+
+    def module_init(self):
+        return 0
+
+    def module_exit(self):
+        logging.debug("emulator: %s", self.stats())
+
+    def stats(self):
+        return {'elapsed': round(self.clock, 3),
+                'spi_time': round(self.spi_time, 3),
+                'busy_time': round(self.busy_time, 3),
+                'spi_bytes': self.spi_bytes,
+                'refreshes': self.refreshes}
+
+    # Controller
+
+    def begin(self, command):
+        self.command = command
+        self.args = bytearray()
+        self.offset = 0
+
+        if command == 0x04:  # POWER_ON
+            self.busy(self.POWER_ON_TIME)
+        elif command == 0x12:  # DISPLAY_REFRESH
+            self.refresh(0, 0, self.width, self.height)
+
+    def data(self, byte):
+        command = self.command
+
+        if command in (0x10, 0x13):  # DATA_START_TRANSMISSION 1 and 2
+            ram = self.ram[command]
+            if self.offset < len(ram):
+                ram[self.offset] = byte
+            self.offset += 1
+
+        elif command in (0x14, 0x15):  # PARTIAL_DATA_START_TRANSMISSION
+            if len(self.args) < 8:
+                self.args.append(byte)
+                return
+            # 0x14 writes the old data RAM, 0x15 the new one
+            ram = self.ram[{0x14: 0x10, 0x15: 0x13}[command]]
+            x, y, w, l = self.window_args()
+            row, col = divmod(self.offset, max((w + 7) // 8, 1))
+            index = (y + row) * (self.width // 8) + x // 8 + col
+            if row < l and index < len(ram):
+                ram[index] = byte
+            self.offset += 1
+
+        else:
+            self.args.append(byte)
+
+            if command == 0x16 and len(self.args) == 8:
+                # PARTIAL_DISPLAY_REFRESH; the single byte form sent at
+                # init time does not refresh anything
+                self.refresh(*self.window_args())
+            elif command == 0x30:
+                self.pll = byte
+            elif command == 0x61 and len(self.args) == 4:
+                self.resize(self.args[0] << 8 | self.args[1],
+                            self.args[2] << 8 | self.args[3])
+            elif 0x20 <= command <= 0x25:
+                self.luts[command] = bytes(self.args)
+
+    def window_args(self):
+        a = self.args
+        return (a[0] << 8 | a[1], a[2] << 8 | a[3],
+                a[4] << 8 | a[5], a[6] << 8 | a[7])
+
+    def busy(self, duration):
+        self.busy_until = max(self.busy_until, self.clock) + duration
+        self.busy_time += duration
+
+    def refresh_time(self):
+        # The VCOM LUT is two header bytes then up to seven groups of a
+        # level byte, four phase lengths in frames and a repeat count.
+        lut = self.luts.get(0x20)
+        if not lut:
+            return self.OTP_REFRESH_TIME
+
+        frames = 0
+        for group in range(2, len(lut) - 5, 6):
+            frames += sum(lut[group + 1:group + 5]) * lut[group + 5]
+
+        rate = self.FRAME_RATES.get(self.pll, self.DEFAULT_FRAME_RATE)
+        return frames / rate
+
+    def refresh(self, x, y, w, l):
+        self.busy(self.refresh_time())
+        self.refreshes += 1
+
+        # With the gray LUTs loaded the two RAMs are the two bits of each
+        # pixel's level; otherwise the new data RAM is the image.
+        gray = 0x25 in self.luts
+        if len(self.image) != self.width * self.height:
+            self.image = bytearray([0xFF]) * (self.width * self.height)
+        old, new = self.ram[0x10], self.ram[0x13]
+        levels = (0x00, 0x80, 0xC0, 0xFF)
+        stride = self.width // 8
+
+        for row in range(y, min(y + l, self.height)):
+            for col in range(x // 8, min((x + w) // 8, stride)):
+                index = row * stride + col
+                for bit in range(8):
+                    mask = 0x80 >> bit
+                    level = 3 if new[index] & mask else 0
+                    if gray:
+                        level = ((2 if old[index] & mask else 0) |
+                                 (1 if new[index] & mask else 0))
+                    self.image[row * self.width + col * 8 + bit] = levels[level]
+
+        if self.dump_dir:
+            path = os.path.join(self.dump_dir, f'frame{self.refreshes:04d}.pgm')
+            with open(path, 'wb') as f:
+                f.write(f'P5 {self.width} {self.height} 255\n'.encode())
+                f.write(self.image)
+
+
+if os.environ.get('EPD_BACKEND') == 'emulator':
+    implementation = Emulator()
+elif os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835'):
     implementation = RaspberryPi()
 else:
     implementation = JetsonNano()
@@ -0,0 +1,195 @@
+# Panel descriptions for waveshare_epd.panel.
+#
+# Each model is data only: resolution, the command sequences to bring the
+# controller up, refresh it and put it to sleep, and its waveform LUTs.
+# Adding another Waveshare panel means transcribing its vendor driver into
+# one more PanelModel here, not another copy of the driver code.
+
+from .panelmodel import BUSY, PanelModel
+
+
+# 2.7 inch e-Paper HAT, IL91874 controller.  Transcribed from epd2in7.py.
+
+LUT_VCOM = [
+    0x00, 0x00,
+    0x00, 0x08, 0x00, 0x00, 0x00, 0x02,
+    0x60, 0x28, 0x28, 0x00, 0x00, 0x01,
+    0x00, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0x00, 0x12, 0x12, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+LUT_WW = [
+    0x40, 0x08, 0x00, 0x00, 0x00, 0x02,
+    0x90, 0x28, 0x28, 0x00, 0x00, 0x01,
+    0x40, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0xA0, 0x12, 0x12, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+LUT_BW = [
+    0x40, 0x08, 0x00, 0x00, 0x00, 0x02,
+    0x90, 0x28, 0x28, 0x00, 0x00, 0x01,
+    0x40, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0xA0, 0x12, 0x12, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+LUT_BB = [
+    0x80, 0x08, 0x00, 0x00, 0x00, 0x02,
+    0x90, 0x28, 0x28, 0x00, 0x00, 0x01,
+    0x80, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0x50, 0x12, 0x12, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+LUT_WB = [
+    0x80, 0x08, 0x00, 0x00, 0x00, 0x02,
+    0x90, 0x28, 0x28, 0x00, 0x00, 0x01,
+    0x80, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0x50, 0x12, 0x12, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+GRAY_LUT_VCOM = [
+    0x00, 0x00,
+    0x00, 0x0A, 0x00, 0x00, 0x00, 0x01,
+    0x60, 0x14, 0x14, 0x00, 0x00, 0x01,
+    0x00, 0x14, 0x00, 0x00, 0x00, 0x01,
+    0x00, 0x13, 0x0A, 0x01, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+GRAY_LUT_WW = [
+    0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
+    0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
+    0x10, 0x14, 0x0A, 0x00, 0x00, 0x01,
+    0xA0, 0x13, 0x01, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+GRAY_LUT_BW = [
+    0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
+    0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
+    0x00, 0x14, 0x0A, 0x00, 0x00, 0x01,
+    0x99, 0x0C, 0x01, 0x03, 0x04, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+GRAY_LUT_WB = [
+    0x40, 0x0A, 0x00, 0x00, 0x00, 0x01,
+    0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
+    0x00, 0x14, 0x0A, 0x00, 0x00, 0x01,
+    0x99, 0x0B, 0x04, 0x04, 0x01, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+GRAY_LUT_BB = [
+    0x80, 0x0A, 0x00, 0x00, 0x00, 0x01,
+    0x90, 0x14, 0x14, 0x00, 0x00, 0x01,
+    0x20, 0x14, 0x0A, 0x00, 0x00, 0x01,
+    0x50, 0x13, 0x01, 0x00, 0x00, 0x01,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+]
+
+EPD2IN7 = PanelModel(
+    name='epd2in7',
+    width=176,
+    height=264,
+    busy_level=0,  # BUSY reads 0 while the panel is busy
+    init=[
+        (0x01, [0x03, 0x00, 0x2B, 0x2B, 0x09]),  # POWER_SETTING
+        (0x06, [0x07, 0x07, 0x17]),  # BOOSTER_SOFT_START
+        (0xF8, [0x60, 0xA5]),  # power optimization
+        (0xF8, [0x89, 0xA5]),
+        (0xF8, [0x90, 0x00]),
+        (0xF8, [0x93, 0x2A]),
+        (0xF8, [0xA0, 0xA5]),
+        (0xF8, [0xA1, 0x00]),
+        (0xF8, [0x73, 0x41]),
+        (0x16, [0x00]),  # PARTIAL_DISPLAY_REFRESH
+        (0x04, []),  # POWER_ON
+        BUSY,
+        (0x00, [0xAF]),  # PANEL_SETTING: KW-BF KWR-AF BWROTP 0f
+        (0x30, [0x3A]),  # PLL_CONTROL: 100Hz
+        (0x50, [0x57]),  # VCOM AND DATA INTERVAL SETTING
+        (0x82, [0x12]),  # VCM_DC_SETTING_REGISTER
+    ],
+    luts={
+        0x20: LUT_VCOM,
+        0x21: LUT_WW,
+        0x22: LUT_BW,
+        0x23: LUT_BB,
+        0x24: LUT_WB,
+    },
+    refresh=[
+        (0x12, []),  # DISPLAY_REFRESH
+        BUSY,
+    ],
+    standby=[
+        (0x02, []),  # POWER_OFF
+        BUSY,
+    ],
+    wake=[
+        (0x04, []),  # POWER_ON
+        BUSY,
+    ],
+    sleep=[
+        (0x50, [0xF7]),
+        (0x02, []),  # POWER_OFF
+        (0x07, [0xA5]),  # DEEP_SLEEP
+        ('delay', 2000),
+    ],
+    gray_init=[
+        (0x01, [0x03, 0x00, 0x2B, 0x2B]),  # POWER_SETTING
+        (0x06, [0x07, 0x07, 0x17]),  # BOOSTER_SOFT_START
+        (0xF8, [0x60, 0xA5]),
+        (0xF8, [0x89, 0xA5]),
+        (0xF8, [0x90, 0x00]),
+        (0xF8, [0x93, 0x2A]),
+        (0xF8, [0xA0, 0xA5]),
+        (0xF8, [0xA1, 0x00]),
+        (0xF8, [0x73, 0x41]),
+        (0x16, [0x00]),
+        (0x04, []),  # POWER_ON
+        BUSY,
+        (0x00, [0xBF]),  # PANEL_SETTING
+        (0x30, [0x90]),  # PLL_CONTROL: 100Hz
+        (0x61, [0x00, 0xB0, 0x01, 0x08]),  # RESOLUTION: 176x264
+        (0x82, [0x12]),  # VCM_DC_SETTING_REGISTER
+        (0x50, [0x57]),  # VCOM AND DATA INTERVAL SETTING
+    ],
+    gray_luts={
+        0x20: GRAY_LUT_VCOM,
+        0x21: GRAY_LUT_WW,
+        0x22: GRAY_LUT_BW,
+        0x23: GRAY_LUT_WB,
+        0x24: GRAY_LUT_BB,
+        0x25: GRAY_LUT_WW,
+    },
+    gray_refresh=[
+        (0x12, []),  # DISPLAY_REFRESH
+        ('delay', 200),
+        BUSY,
+    ],
+)
@@ -0,0 +1,151 @@
+# Generic driver for Waveshare e-Paper panels.
+#
+# The vendor drivers (epd2in7.py and friends) each carry their own copy of
+# the same code: init sequences spelled out as send_command()/send_data()
+# calls, buffers packed one pixel at a time in Python, and frames pushed
+# over SPI one byte at a time with the chip select toggled around every
+# byte.  Here a panel is described by a PanelModel (see panelmodel.py and
+# models.py), and one Panel class drives any of them:
+#
+# - frames are packed by Pillow in C (transpose + tobytes) instead of a
+#   per-pixel Python loop, and
+# - frame data goes out in a single bulk SPI transfer per RAM write.
+
+import logging
+
+from . import epdconfig
+from .panelmodel import BUSY, WHITE, pack, pack_4gray
+
+
+class Panel:
+    def __init__(self, model):
+        self.model = model
+        self.width = model.width
+        self.height = model.height
+        self.reset_pin = epdconfig.RST_PIN
+        self.dc_pin = epdconfig.DC_PIN
+        self.busy_pin = epdconfig.BUSY_PIN
+        self.cs_pin = epdconfig.CS_PIN
+
+        # What we write into the old data RAM before every full refresh.
+        self.blank = bytes([WHITE]) * model.frame_size
+
+        # Not every epdconfig backend can do bulk transfers.
+        self.bulk_write = getattr(epdconfig, 'spi_writebyte2', None)
+
+        self.powered = False
+
+    # Hardware reset
+    def reset(self):
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(200)
+        epdconfig.digital_write(self.reset_pin, 0)
+        epdconfig.delay_ms(5)
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(200)
+
+    def send_command(self, command):
+        epdconfig.digital_write(self.dc_pin, 0)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte([command])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def send_data(self, data):
+        # Send a whole run of data bytes with a single chip select.
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        if self.bulk_write is not None:
+            self.bulk_write(data)
+        else:
+            for byte in data:
+                epdconfig.spi_writebyte([byte])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def read_busy(self):
+        logging.debug("e-Paper busy")
+        while epdconfig.digital_read(self.busy_pin) == self.model.busy_level:
+            epdconfig.delay_ms(10)
+        logging.debug("e-Paper busy release")
+
+    def run(self, sequence):
+        for step in sequence:
+            if step == BUSY:
+                self.read_busy()
+            elif step[0] == 'delay':
+                epdconfig.delay_ms(step[1])
+            else:
+                command, data = step
+                self.send_command(command)
+                if data:
+                    self.send_data(bytes(data))
+
+    def set_luts(self, luts):
+        for register, table in luts.items():
+            self.send_command(register)
+            self.send_data(bytes(table))
+
+    def init(self, gray=False):
+        if gray and not self.model.supports_gray:
+            raise ValueError(f'{self.model.name} has no gray mode')
+
+        if epdconfig.module_init() != 0:
+            return -1
+
+        self.reset()
+        self.powered = True
+        if gray:
+            # the gray LUTs are loaded right before each gray refresh
+            self.run(self.model.gray_init)
+        else:
+            self.run(self.model.init)
+            self.set_luts(self.model.luts)
+        return 0
+
+    def getbuffer(self, image):
+        return pack(self.model, image)
+
+    def getbuffer_4gray(self, image):
+        return pack_4gray(self.model, image)
+
+    def display(self, buf):
+        self.send_command(self.model.old_data)
+        self.send_data(self.blank)
+        self.send_command(self.model.new_data)
+        self.send_data(buf)
+        self.power_up()
+        self.run(self.model.refresh)
+
+    def display_4gray(self, planes):
+        old, new = planes
+        self.send_command(self.model.old_data)
+        self.send_data(old)
+        self.send_command(self.model.new_data)
+        self.send_data(new)
+        self.set_luts(self.model.gray_luts)
+        self.power_up()
+        self.run(self.model.gray_refresh)
+
+    def clear(self, color=WHITE):
+        fill = bytes([color]) * self.model.frame_size
+        self.send_command(self.model.old_data)
+        self.send_data(fill)
+        self.send_command(self.model.new_data)
+        self.send_data(fill)
+        self.power_up()
+        self.run(self.model.refresh)
+
+    def power_up(self):
+        # The frame RAM takes data with the power off, so this only has to
+        # happen right before the refresh.
+        if not self.powered:
+            self.run(self.model.wake)
+            self.powered = True
+
+    def standby(self):
+        self.run(self.model.standby)
+        self.powered = False
+
+    def sleep(self):
+        self.run(self.model.sleep)
+        self.powered = False
+        epdconfig.module_exit()
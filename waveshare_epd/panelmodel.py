@@ -0,0 +1,91 @@
+# Panel descriptions and frame packing.  Nothing in here touches the
+# hardware, so a process that only renders frames can pack them without
+# importing epdconfig (and with it RPi.GPIO and spidev).
+
+from PIL import Image
+
+# Marker for an init/refresh sequence step that waits for the BUSY pin.
+BUSY = 'busy'
+
+WHITE = 0xFF
+
+
+class PanelModel:
+    """Everything that differs between two panels.
+
+    Sequences are lists of steps, each either (command, [data bytes]),
+    BUSY to wait for the panel, or ('delay', ms).  LUTs are a dict of
+    register -> table, written in that order.  'standby' and 'wake' turn
+    the panel's power off and back on without losing its settings, for
+    callers that refresh often enough that a full init each time costs too
+    much."""
+
+    def __init__(self, name, width, height, init, luts, refresh, sleep,
+                 busy_level=0, old_data=0x10, new_data=0x13,
+                 standby=None, wake=None,
+                 gray_init=None, gray_luts=None, gray_refresh=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.init = init
+        self.luts = luts
+        self.refresh = refresh
+        self.sleep = sleep
+        self.busy_level = busy_level
+        self.old_data = old_data
+        self.new_data = new_data
+        self.standby = standby
+        self.wake = wake
+        self.gray_init = gray_init
+        self.gray_luts = gray_luts
+        self.gray_refresh = gray_refresh
+
+    @property
+    def frame_size(self):
+        return self.width * self.height // 8
+
+    @property
+    def supports_gray(self):
+        return self.gray_init is not None
+
+
+# 4-gray frames go out as two 1 bit planes, one to each frame RAM.  These
+# tables map an 8 bit gray level straight to its bit in each plane; they
+# are what the vendor getbuffer_4Gray()/display_4Gray() pair work out one
+# pixel at a time (0xC0 and 0x80 are remapped first, then the top two bits
+# of the level select white/gray1/gray2/black).
+
+def _gray_level(value):
+    if value == 0xC0:
+        value = 0x80
+    elif value == 0x80:
+        value = 0x40
+    return value & 0xC0
+
+
+GRAY_PLANE_OLD = [255 if _gray_level(v) & 0x80 else 0 for v in range(256)]
+GRAY_PLANE_NEW = [255 if _gray_level(v) & 0x40 else 0 for v in range(256)]
+
+
+def orient(model, image):
+    # Bring a portrait or landscape image into the panel's native portrait
+    # layout.  Landscape images are turned 90 degrees counter clockwise, the
+    # same mapping the vendor getbuffer() uses.
+    if image.size == (model.width, model.height):
+        return image
+    if image.size == (model.height, model.width):
+        return image.transpose(Image.ROTATE_90)
+    raise ValueError(f'image is {image.size[0]}x{image.size[1]}, '
+                     f'panel is {model.width}x{model.height}')
+
+
+def pack(model, image):
+    # Mode '1' rows pack MSB first with 1 for white, which is exactly the
+    # frame RAM layout.
+    return orient(model, image.convert('1')).tobytes()
+
+
+def pack_4gray(model, image):
+    image = orient(model, image.convert('L'))
+    return (image.point(GRAY_PLANE_OLD, '1').tobytes(),
+            image.point(GRAY_PLANE_NEW, '1').tobytes())